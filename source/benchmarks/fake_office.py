@@ -0,0 +1,1143 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for the part of the LibreOffice UNO API the extension uses:
+text cursors, search descriptors, text fields, configuration access and UI configuration managers.
+
+Every call of a public fake method and every access of a capitalized (UNO) property
+is counted in `calls`, helpers of the fakes start with an underscore and are not counted.
+"""
+import pathlib
+import random
+import re
+import sys
+import tempfile
+import types
+from collections import Counter, namedtuple
+from itertools import count
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+calls = Counter()
+Any = namedtuple("Any", ["type", "value"])
+# NOTE: Like in the office, a text content anchored as character takes one position of the text,
+# here it is a private use character mapped to the content, shared by all fake documents
+_anchor_characters = count(0xF0000)
+_anchored = {}
+_shown = {}
+
+
+def anchor_character(content, shown: str = "") -> str:
+    """Allocates the character standing for the content in paragraphs, getString() shows it as the shown text"""
+    character = chr(next(_anchor_characters))
+    _anchored[character] = content
+    _shown[ord(character)] = shown
+    return character
+
+
+def export_string(string: str) -> str:
+    """Returns the string as getString() does: fields expanded to their shown text, annotations skipped"""
+    return string.translate(_shown)
+
+ANNOTATION_SERVICE = "com.sun.star.text.textfield.Annotation"
+PAGE_NUMBER_SERVICE = "com.sun.star.text.textfield.PageNumber"
+PARAGRAPH_SERVICE = "com.sun.star.text.Paragraph"
+TEXT_TABLE_SERVICE = "com.sun.star.text.TextTable"
+TEXT_DOCUMENT_SERVICE = "com.sun.star.text.TextDocument"
+# About 1800 characters, a standard typewritten page
+PARAGRAPHS_PER_PAGE = 5
+PAGES_PER_FRAME = 10
+PAGES_PER_TABLE = 10
+TABLE_CELL_NAMES = ("A1", "B1", "A2", "B2", )
+# Every n-th paragraph template has a field, a reviewer's comment over a word or a metadata field
+TEMPLATES_PER_FIELD = 7
+TEMPLATES_PER_COMMENT = 11
+TEMPLATES_PER_METADATA = 13
+REVIEWER = "Reviewer"
+WORDS = (
+    "текст", "страница", "глава", "документ", "сноска", "таблица", "рисунок", "абзац",
+    "text", "page", "chapter", "document", "footnote", "table", "figure", "paragraph",
+)
+WRITER_MODULES = (
+    "com.sun.star.text.TextDocument", "com.sun.star.text.GlobalDocument", "com.sun.star.text.WebDocument",
+    "com.sun.star.xforms.XMLFormDocument", "com.sun.star.sdb.FormDesign", "com.sun.star.sdb.TextReportDesign",
+    "com.sun.star.sheet.SpreadsheetDocument", "com.sun.star.presentation.PresentationDocument",
+    "com.sun.star.drawing.DrawingDocument", "com.sun.star.formula.FormulaProperties",
+    "com.sun.star.sdb.OfficeDatabaseDocument", "com.sun.star.sdb.RelationDesign", "com.sun.star.sdb.QueryDesign",
+    "com.sun.star.sdb.TableDesign", "com.sun.star.sdb.DataSourceBrowser", "com.sun.star.frame.StartModule",
+    "com.sun.star.script.BasicIDE", "com.sun.star.chart2.ChartDocument",
+)
+STANDARD_BAR = "private:resource/toolbar/standardbar"
+STANDARD_BAR_COMMANDS = (
+    ".uno:OpenUrl", ".uno:AddDirect", ".uno:Open", ".uno:Save", ".uno:SendMail", ".uno:EditDoc",
+    ".uno:ExportDirectToPDF", ".uno:PrintDefault", ".uno:PrintPreview", ".uno:Cut", ".uno:Copy", ".uno:Paste",
+    ".uno:SetDefault", ".uno:FormatPaintbrush", ".uno:Undo", ".uno:Redo", ".uno:SearchDialog",
+    ".uno:SpellingAndGrammarDialog", ".uno:ControlCodes", ".uno:InsertTable", ".uno:InsertGraphic",
+    ".uno:InsertObjectChart", ".uno:CharmapControl", ".uno:InsertPagebreak", ".uno:HyperlinkDialog",
+    ".uno:InsertFootnote", ".uno:InsertAnnotation", ".uno:TrackChanges", ".uno:BasicShapes",
+    ".uno:Zoom", ".uno:ExtendedHelp",
+)
+
+
+def counted(name, method):
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        return method(*args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class UnoObject:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if not name.startswith("_") and callable(value):
+                setattr(cls, name, counted(f"{cls.__name__}.{name}", value))
+
+    def __init__(self, **properties):
+        self._properties = properties
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        calls[f"{type(self).__name__}.{name}"] += 1
+        return self._get_property(name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+            return
+        calls[f"{type(self).__name__}.{name}"] += 1
+        self._set_property(name, value)
+
+    def _get_property(self, name):
+        try:
+            return self._properties[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _set_property(self, name, value):
+        self._properties[name] = value
+
+
+class Struct:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class KeyEvent(Struct):
+    def __init__(self):
+        super().__init__(Modifiers=0, KeyCode=0, KeyChar="", KeyFunc=0)
+
+
+class UnoException(Exception):
+    pass
+
+
+class UnknownPropertyException(UnoException):
+    pass
+
+
+class IllegalArgumentException(UnoException):
+    pass
+
+
+class NoSuchElementException(UnoException):
+    pass
+
+
+class RuntimeException(UnoException):
+    pass
+
+
+class Enumeration(UnoObject):
+    _end = object()
+
+    def __init__(self, elements):
+        super().__init__()
+        self._elements = iter(elements)
+        self._next = next(self._elements, self._end)
+
+    def hasMoreElements(self):
+        return self._next is not self._end
+
+    def nextElement(self):
+        element = self._next
+        if element is self._end:
+            raise NoSuchElementException()
+        self._next = next(self._elements, self._end)
+        return element
+
+
+class EnumerationAccess(UnoObject):
+    def __init__(self, elements):
+        super().__init__()
+        self._elements = elements
+
+    def createEnumeration(self):
+        return Enumeration(list(self._elements))
+
+
+class IndexContainer(UnoObject):
+    def __init__(self, elements=()):
+        super().__init__()
+        self._elements = list(elements)
+
+    def getCount(self):
+        return len(self._elements)
+
+    def getByIndex(self, index):
+        return self._elements[index]
+
+    def insertByIndex(self, index, element):
+        self._elements.insert(index, element)
+
+    def removeByIndex(self, index):
+        del self._elements[index]
+
+    def replaceByIndex(self, index, element):
+        self._elements[index] = element
+
+
+class TextRange(UnoObject):
+    """Positions are (paragraph index, offset) pairs inside one Text, paragraph breaks count as one character"""
+
+    def __init__(self, text, start, end=None, **properties):
+        super().__init__(**properties)
+        self._text = text
+        self._start = start
+        self._end = start if end is None else end
+
+    def getText(self):
+        return self._text
+
+    def getStart(self):
+        return TextRange(self._text, self._start)
+
+    def getEnd(self):
+        return TextRange(self._text, self._end)
+
+    def getString(self):
+        return self._text._string(self._start, self._end)
+
+    def setString(self, string):
+        self._end = self._text._replace(self._start, self._end, string)
+
+    def setPropertyValue(self, name, value):
+        self._text._format(self._start, self._end, {name: value})
+
+    def setPropertyValues(self, names, values):
+        self._text._format(self._start, self._end, dict(zip(names, values)))
+
+    def getPropertyValue(self, name):
+        return self._get_property(name)
+
+    def _get_property(self, name):
+        if name.startswith("Char"):
+            return self._text._attribute(self._start, name)
+        return super()._get_property(name)
+
+    def _set_property(self, name, value):
+        if name.startswith("Char"):
+            self._text._format(self._start, self._end, {name: value})
+        else:
+            super()._set_property(name, value)
+
+
+class TextPortion(TextRange):
+    pass
+
+
+class Paragraph(TextRange):
+    """A whole paragraph or, when enumerated from a cursor, its part inside the cursor"""
+
+    def __init__(self, text, index, start=0, end=None):
+        super().__init__(text, (index, start), (index, len(text._paragraphs[index]) if end is None else end))
+
+    def supportsService(self, name):
+        return name == PARAGRAPH_SERVICE
+
+    def createEnumeration(self):
+        return Enumeration(self._text._portions(self._start[0], self._start[1], self._end[1]))
+
+
+class TextField(UnoObject):
+    def __init__(self, service, shown):
+        super().__init__()
+        self._service = service
+        self._character = anchor_character(self, shown)
+
+    def supportsService(self, name):
+        return name == self._service
+
+
+class Metadata(UnoObject):
+    """In content metadata: its character followed by its own text of the given length"""
+
+    def __init__(self, length):
+        super().__init__()
+        self._length = length
+        self._character = anchor_character(self)
+        self._text = None
+
+    def createEnumeration(self):
+        for index, paragraph in enumerate(self._text._paragraphs):
+            offset = paragraph.find(self._character)
+            if offset >= 0:
+                return Enumeration(self._text._portions(index, offset + 1, offset + 1 + self._length))
+        raise RuntimeException("The metadata is not in the text")
+
+
+class TextTable(UnoObject):
+    def __init__(self, document, cells):
+        super().__init__()
+        self._cells = {name: Text(document, [paragraph]) for name, paragraph in zip(TABLE_CELL_NAMES, cells)}
+
+    def supportsService(self, name):
+        return name == TEXT_TABLE_SERVICE
+
+    def getCellNames(self):
+        return tuple(self._cells)
+
+    def getCellByName(self, name):
+        return self._cells[name]
+
+
+class TextCursor(TextRange):
+    def isCollapsed(self):
+        return self._start == self._end
+
+    def collapseToStart(self):
+        self._end = self._start
+
+    def collapseToEnd(self):
+        self._start = self._end
+
+    def goRight(self, count_, expand):
+        self._end, is_moved = self._text._move(self._end, count_)
+        if not expand:
+            self._start = self._end
+        return is_moved
+
+    def gotoRange(self, text_range, expand):
+        self._text._check(text_range)
+        self._end = text_range._end
+        if not expand:
+            self._start = text_range._start
+
+    def gotoStart(self, expand):
+        self._end = (0, 0)
+        if not expand:
+            self._start = self._end
+
+    def gotoEnd(self, expand):
+        self._end = self._text._last_position()
+        if not expand:
+            self._start = self._end
+
+    def createEnumeration(self):
+        return Enumeration(self._text._elements(*sorted((self._start, self._end))))
+
+
+class ViewCursor(TextCursor):
+    def _select(self, start, end):
+        self._start, self._end = start, end
+
+
+class Text(UnoObject):
+    def __init__(self, document, paragraphs, marks=None, tables=None):
+        super().__init__()
+        self._document = document
+        self._paragraphs = list(paragraphs)
+        # NOTE: Formatting is stored sparsely as (start, end, properties) spans per paragraph
+        self._spans = {}
+        # Start marks of ranged annotations as [(offset, annotation)] and tables following the paragraph
+        self._marks = marks or {}
+        self._tables = tables or {}
+        for paragraph in self._paragraphs:
+            self._adopt(paragraph)
+
+    def getText(self):
+        return self
+
+    def getStart(self):
+        return TextRange(self, (0, 0))
+
+    def getEnd(self):
+        return TextRange(self, self._last_position())
+
+    def getString(self):
+        return export_string("\n".join(self._paragraphs))
+
+    def createTextCursor(self):
+        return TextCursor(self, (0, 0))
+
+    def createTextCursorByRange(self, text_range):
+        self._check(text_range)
+        return TextCursor(self, text_range._start, text_range._end)
+
+    def createEnumeration(self):
+        return Enumeration(self._elements((0, 0), self._last_position()))
+
+    def compareRegionStarts(self, first, second):
+        self._check(first)
+        self._check(second)
+        return self._compare(first._start, second._start)
+
+    def compareRegionEnds(self, first, second):
+        self._check(first)
+        self._check(second)
+        return self._compare(first._end, second._end)
+
+    def insertTextContent(self, text_range, content, absorb):
+        """Inserts an annotation: at a point, or over the range with its character at the end of the range"""
+        self._check(text_range)
+        start, end = sorted((text_range._start, text_range._end))
+        if start != end:
+            content._is_ranged = True
+            self._marks.setdefault(start[0], []).append((start[1], content))
+        self._insert_character(end, content._character)
+        content._anchor = TextRange(self, start, (end[0], end[1] + 1))
+        self._document._fields.append(content)
+
+    def removeTextContent(self, content):
+        if content not in self._document._fields:
+            raise RuntimeException("The text content is already removed")
+        self._document._fields.remove(content)
+        for index, paragraph in enumerate(self._paragraphs):
+            offset = paragraph.find(content._character)
+            if offset >= 0:
+                self._paragraphs[index] = paragraph[:offset] + paragraph[offset + 1:]
+                self._shift_marks(index, offset, -1)
+        for index, marks in self._marks.items():
+            marks[:] = [(offset, annotation) for offset, annotation in marks if annotation is not content]
+
+    def _check(self, text_range):
+        if getattr(text_range, "_text", None) is not self:
+            raise IllegalArgumentException("The text range belongs to another text")
+
+    @staticmethod
+    def _compare(first, second):
+        return (first < second) - (first > second)
+
+    def _last_position(self):
+        return len(self._paragraphs) - 1, len(self._paragraphs[-1])
+
+    def _move(self, position, count_):
+        index, offset = position
+        while count_ > 0:
+            remaining = len(self._paragraphs[index]) - offset
+            if count_ <= remaining:
+                return (index, offset + count_), True
+            if index == len(self._paragraphs) - 1:
+                return (index, len(self._paragraphs[index])), False
+            count_ -= remaining + 1
+            index, offset = index + 1, 0
+        return (index, offset), True
+
+    def _string(self, start, end):
+        if start[0] == end[0]:
+            return export_string(self._paragraphs[start[0]][start[1]:end[1]])
+        middle = self._paragraphs[start[0] + 1:end[0]]
+        return export_string(
+            "\n".join([self._paragraphs[start[0]][start[1]:], *middle, self._paragraphs[end[0]][:end[1]]]))
+
+    def _adopt(self, paragraph):
+        for character in paragraph:
+            content = _anchored.get(character)
+            if isinstance(content, Metadata):
+                content._text = self
+
+    def _elements(self, start, end):
+        """Yields paragraphs between the positions, the first and the last ones cut to them, and tables inside"""
+        for index in range(start[0], end[0] + 1):
+            yield Paragraph(
+                self, index, start[1] if index == start[0] else 0, end[1] if index == end[0] else None)
+            if index < end[0]:
+                yield from self._tables.get(index, ())
+
+    def _portions(self, index, start, end):
+        """Splits the part of the paragraph into text portions like the office does"""
+        paragraph, portions, run_start = self._paragraphs[index], [], start
+        marks = {}
+        for offset, annotation in self._marks.get(index, ()):
+            marks.setdefault(offset, []).append(annotation)
+
+        offset = start
+        while offset <= end:
+            content = _anchored.get(paragraph[offset]) if offset < end else None
+            if offset in marks or content is not None or offset == end:
+                if run_start < offset:
+                    portions.append(TextPortion(self, (index, run_start), (index, offset), TextPortionType="Text"))
+                # NOTE: The start of a ranged annotation is a mark, its character is at the end of the range
+                portions.extend(
+                    TextPortion(self, (index, offset), (index, offset), TextPortionType="Annotation", TextField=mark)
+                    for mark in marks.get(offset, ()))
+                if content is not None:
+                    width = 1 + content._length if isinstance(content, Metadata) else 1
+                    portions.append(
+                        TextPortion(self, (index, offset), (index, offset + width), **content_portion(content)))
+                    offset += width
+                    run_start = offset
+                    continue
+                run_start = offset
+            offset += 1
+        return portions
+
+    def _insert_character(self, position, character):
+        index, offset = position
+        self._paragraphs[index] = self._paragraphs[index][:offset] + character + self._paragraphs[index][offset:]
+        self._shift_marks(index, offset, 1)
+
+    def _shift_marks(self, index, offset, delta):
+        self._marks[index] = [
+            (mark_offset + delta if mark_offset > offset else mark_offset, annotation)
+            for mark_offset, annotation in self._marks.get(index, ())]
+
+    def _replace(self, start, end, string):
+        paragraph_start, paragraph_end = self._paragraphs[start[0]][:start[1]], self._paragraphs[end[0]][end[1]:]
+        lines = string.split("\n")
+        lines[0], lines[-1] = paragraph_start + lines[0], lines[-1] + paragraph_end
+        self._paragraphs[start[0]:end[0] + 1] = lines
+        return start[0] + len(lines) - 1, len(lines[-1]) - len(paragraph_end)
+
+    def _format(self, start, end, properties):
+        for index in range(start[0], end[0] + 1):
+            span_start = start[1] if index == start[0] else 0
+            span_end = end[1] if index == end[0] else len(self._paragraphs[index])
+            self._spans.setdefault(index, []).append((span_start, span_end, properties))
+
+    def _attribute(self, position, name):
+        index, offset = position
+        for span_start, span_end, properties in reversed(self._spans.get(index, ())):
+            if span_start <= offset <= span_end and name in properties:
+                return properties[name]
+        return self._document._default_attributes.get(name)
+
+    def _find(self, pattern, start=(0, 0)):
+        index, offset = start
+        for index in range(index, len(self._paragraphs)):
+            for found in pattern.finditer(self._paragraphs[index], offset):
+                if found.end() > found.start():
+                    yield TextRange(self, (index, found.start()), (index, found.end()))
+            offset = 0
+
+
+def content_portion(content) -> dict:
+    """Returns the type and properties of the portion of a text content anchored as character"""
+    if isinstance(content, Metadata):
+        return {"TextPortionType": "InContentMetadata", "NestedTextContent": content}
+    if isinstance(content, Annotation):
+        return {"TextPortionType": "AnnotationEnd" if content._is_ranged else "Annotation", "TextField": content}
+    return {"TextPortionType": "TextField", "TextField": content}
+
+
+class TextFrame(UnoObject):
+    def __init__(self, text):
+        super().__init__()
+        self._text = text
+
+    def getText(self):
+        return self._text
+
+
+class NameAccess(UnoObject):
+    def __init__(self, elements):
+        super().__init__()
+        self._elements = elements
+
+    def getElementNames(self):
+        return tuple(self._elements)
+
+    def getByName(self, name):
+        try:
+            return self._elements[name]
+        except KeyError:
+            raise NoSuchElementException(name) from None
+
+    def hasByName(self, name):
+        return name in self._elements
+
+
+class PageStyle(UnoObject):
+    def __init__(self, document, is_in_use, header_paragraphs=None, footer_paragraphs=None):
+        super().__init__(
+            HeaderIsOn=header_paragraphs is not None, FooterIsOn=footer_paragraphs is not None,
+            HeaderText=header_paragraphs and Text(document, header_paragraphs),
+            FooterText=footer_paragraphs and Text(document, footer_paragraphs))
+        self._is_in_use = is_in_use
+
+    def isInUse(self):
+        return self._is_in_use
+
+    def getPropertyValue(self, name):
+        if name.endswith(("TextLeft", "TextFirst")):
+            # NOTE: Shared headers and footers, the same text on every page
+            name = name.replace("Left", "").replace("First", "")
+        if name not in self._properties:
+            raise UnknownPropertyException(name)
+        return self._properties[name]
+
+
+class ReplaceDescriptor(UnoObject):
+    def __init__(self):
+        super().__init__(SearchRegularExpression=False, SearchString="", ReplaceString="")
+        self._replace_attributes = {}
+
+    def setReplaceAttributes(self, attributes):
+        self._replace_attributes = {attribute.Name: attribute.Value for attribute in attributes}
+
+    def _pattern(self):
+        search_string = self._properties["SearchString"]
+        return re.compile(search_string if self._properties["SearchRegularExpression"] else re.escape(search_string))
+
+
+class Annotation(UnoObject):
+    def __init__(self):
+        super().__init__(Content="", Author="", DateTimeValue=None)
+        self._anchor = None
+        self._is_ranged = False
+        self._character = anchor_character(self)
+
+    def getAnchor(self):
+        """Returns the range from the start mark to the character, wherever insertions moved them"""
+        if self._anchor is None:
+            return None
+        text = self._anchor._text
+        for index, paragraph in enumerate(text._paragraphs):
+            offset = paragraph.find(self._character)
+            if offset >= 0:
+                start = next((mark for mark, annotation in text._marks.get(index, ()) if annotation is self), offset)
+                return TextRange(text, (index, start), (index, offset + 1))
+        return self._anchor
+
+    def supportsService(self, name):
+        return name == ANNOTATION_SERVICE
+
+
+class PropertySetInfo(UnoObject):
+    def __init__(self, values):
+        super().__init__()
+        self._values = values
+
+    def hasPropertyByName(self, name):
+        return name in self._values
+
+
+class UserDefinedProperties(UnoObject):
+    def __init__(self):
+        super().__init__()
+        self._values = {}
+
+    def getPropertySetInfo(self):
+        return PropertySetInfo(self._values)
+
+    def addProperty(self, name, attributes, value):
+        self._values[name] = value
+
+    def removeProperty(self, name):
+        del self._values[name]
+
+    def getPropertyValue(self, name):
+        return self._values[name]
+
+    def setPropertyValue(self, name, value):
+        self._values[name] = value
+
+
+class DocumentProperties(UnoObject):
+    def __init__(self):
+        super().__init__()
+        self._user_defined = UserDefinedProperties()
+
+    def getUserDefinedProperties(self):
+        return self._user_defined
+
+
+class UndoManager(UnoObject):
+    def __init__(self):
+        super().__init__()
+        self._depth = 0
+        self._steps = []
+
+    def enterUndoContext(self, title):
+        if not self._depth:
+            self._steps.append(title)
+        self._depth += 1
+
+    def leaveUndoContext(self):
+        if not self._depth:
+            raise RuntimeException("No undo context to leave")
+        self._depth -= 1
+
+
+class StatusIndicator(UnoObject):
+    def start(self, text, range_):
+        pass
+
+    def setValue(self, value):
+        pass
+
+    def end(self):
+        pass
+
+
+class Frame(UnoObject):
+    def __init__(self, controller):
+        super().__init__()
+        self._controller = controller
+
+    def createStatusIndicator(self):
+        return StatusIndicator()
+
+
+class Controller(UnoObject):
+    def __init__(self, document):
+        super().__init__()
+        self._document = document
+        self._frame = Frame(self)
+        self._properties["ViewCursor"] = ViewCursor(document._body, (0, 0))
+
+    def getViewCursor(self):
+        return self._properties["ViewCursor"]
+
+    def getFrame(self):
+        return self._frame
+
+
+class TextDocument(UnoObject):
+    _uids = count(1)
+
+    def __init__(self, paragraphs, frames=(), tables=None, marks=None, fields=()):
+        """
+        param tables: Cells of the tables following the body paragraphs by their indexes
+        param marks: Start marks of ranged annotations in the body paragraphs by their indexes
+        param fields: Text fields and annotations anchored in the paragraphs
+        """
+        super().__init__(RecordChanges=False, RuntimeUID=str(next(self._uids)))
+        self._default_attributes = {"CharFontName": "Liberation Serif", "CharColor": -1, "CharUnderline": 0}
+        self._tables = {}
+        body_tables = {}
+        for index, cells in (tables or {}).items():
+            table = TextTable(self, cells)
+            self._tables[f"Table{len(self._tables) + 1}"] = table
+            body_tables[index] = [table]
+        self._body = Text(self, paragraphs, marks, body_tables)
+        self._frames = {f"Frame{index}": TextFrame(Text(self, frame)) for index, frame in enumerate(frames, 1)}
+        self._fields = list(fields)
+        self._document_properties = DocumentProperties()
+        self._locks = 0
+        self._undo_manager = UndoManager()
+        self._properties["Text"] = self._body
+        self._page_styles = {
+            "Standard": PageStyle(self, True, ["Header"], ["Footer 1"]),
+            "First Page": PageStyle(self, False, ["First header"]),
+        }
+        self._properties["CurrentController"] = self._controller = Controller(self)
+
+    def getText(self):
+        return self._body
+
+    def getCurrentController(self):
+        return self._controller
+
+    def getTextFrames(self):
+        return NameAccess(self._frames)
+
+    def getTextFields(self):
+        return EnumerationAccess(self._fields)
+
+    def getDocumentProperties(self):
+        return self._document_properties
+
+    def getUndoManager(self):
+        return self._undo_manager
+
+    def getTextTables(self):
+        return NameAccess(self._tables)
+
+    def getStyleFamilies(self):
+        return NameAccess({"PageStyles": NameAccess(self._page_styles)})
+
+    def supportsService(self, name):
+        return name == TEXT_DOCUMENT_SERVICE
+
+    def createInstance(self, name):
+        if name != ANNOTATION_SERVICE:
+            raise NotImplementedError(name)
+        return Annotation()
+
+    def createReplaceDescriptor(self):
+        return ReplaceDescriptor()
+
+    def findAll(self, descriptor):
+        pattern = descriptor._pattern()
+        return IndexContainer(found for text in self._texts() for found in text._find(pattern))
+
+    def findNext(self, start, descriptor):
+        """Searches on from the start through its text and then through the texts after it, like the office"""
+        pattern, texts = descriptor._pattern(), self._texts(with_headers_footers=True)
+        found = next(start._text._find(pattern, start._end), None)
+        for text in texts[texts.index(start._text) + 1:]:
+            if found is not None:
+                return found
+            found = next(text._find(pattern), None)
+        return found
+
+    def replaceAll(self, descriptor):
+        pattern, founds = descriptor._pattern(), 0
+        for text in self._texts(with_headers_footers=True):
+            for found in text._find(pattern):
+                text._format(found._start, found._end, descriptor._replace_attributes)
+                founds += 1
+        return founds
+
+    def lockControllers(self):
+        self._locks += 1
+
+    def unlockControllers(self):
+        self._locks -= 1
+
+    def _get_property(self, name):
+        if name == "ParagraphCount":
+            return sum(len(text._paragraphs) for text in self._texts())
+        return super()._get_property(name)
+
+    def _texts(self, with_headers_footers=False):
+        # NOTE: Like the office, search finds headers, footers and frames content before the body
+        headers_footers = [
+            style._properties[name] for style in self._page_styles.values()
+            for name in ("HeaderText", "FooterText") if with_headers_footers and style._properties[name]]
+        cells = [cell for table in self._tables.values() for cell in table._cells.values()]
+        return [*headers_footers, *(frame._text for frame in self._frames.values()), self._body, *cells]
+
+
+class ConfigurationNode(UnoObject):
+    def __init__(self, values):
+        super().__init__()
+        self._values = values
+
+    def getByName(self, name):
+        return self._values[name]
+
+    def getHierarchicalPropertyValues(self, names):
+        return tuple(self._values.get(name) for name in names)
+
+    def setHierarchicalPropertyValues(self, names, values):
+        self._values.update(zip(names, values))
+
+    def commitChanges(self):
+        pass
+
+    def _get_property(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _set_property(self, name, value):
+        self._values[name] = value
+
+
+class ConfigurationProvider(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def createInstanceWithArguments(self, service_name, arguments):
+        node_path = next(argument.Value for argument in arguments if argument.Name == "nodepath")
+        return ConfigurationNode(self._office._configuration.setdefault(node_path, {}))
+
+
+class ShortCutManager(UnoObject):
+    def __init__(self):
+        super().__init__()
+        self._bindings = {}
+
+    def getCommandByKeyEvent(self, key):
+        try:
+            return self._bindings[(key.Modifiers, key.KeyCode)]
+        except KeyError:
+            raise NoSuchElementException() from None
+
+    def setKeyEvent(self, key, command):
+        self._bindings[(key.Modifiers, key.KeyCode)] = command
+
+    def getKeyEventsByCommand(self, command):
+        keys = [key for key, bound_command in self._bindings.items() if bound_command == command]
+        if not keys:
+            raise NoSuchElementException(command)
+        return tuple(Struct(Modifiers=modifiers, KeyCode=key_code) for modifiers, key_code in keys)
+
+    def removeCommandFromAllKeyEvents(self, command):
+        self._bindings = {key: bound for key, bound in self._bindings.items() if bound != command}
+
+    def store(self):
+        pass
+
+
+class UIConfigurationManager(UnoObject):
+    def __init__(self):
+        super().__init__()
+        self._shortcuts = ShortCutManager()
+        self._settings = {STANDARD_BAR: [
+            (Struct(Name="CommandURL", Value=command), Struct(Name="Label", Value=""),
+             Struct(Name="Type", Value=0), Struct(Name="IsVisible", Value=True))
+            for command in STANDARD_BAR_COMMANDS]}
+
+    def getShortCutManager(self):
+        return self._shortcuts
+
+    def getSettings(self, resource, writable):
+        return IndexContainer(self._settings[resource])
+
+    def replaceSettings(self, resource, settings):
+        self._settings[resource] = list(settings._elements)
+
+    def store(self):
+        pass
+
+
+class ModuleUIConfigurationManagerSupplier(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def getUIConfigurationManager(self, module):
+        return self._office._ui_managers.setdefault(module, UIConfigurationManager())
+
+
+class GlobalEventBroadcaster(UnoObject):
+    def addDocumentEventListener(self, listener):
+        pass
+
+
+class Desktop(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def getCurrentComponent(self):
+        return self._office.document
+
+    def getComponents(self):
+        return EnumerationAccess([self._office.document])
+
+    def addTerminateListener(self, listener):
+        pass
+
+
+class DispatchHelper(UnoObject):
+    def executeDispatch(self, frame, url, target_frame_name, search_flags, arguments):
+        controller = frame._controller
+        view_cursor, values = controller._properties["ViewCursor"], {arg.Name: arg.Value for arg in arguments}
+        if url == ".uno:SelectAll":
+            view_cursor._select((0, 0), view_cursor._text._last_position())
+        elif url == ".uno:CharFontName":
+            view_cursor._text._format(
+                view_cursor._start, view_cursor._end, {"CharFontName": values["CharFontName.FamilyName"]})
+        elif url == ".uno:Color":
+            view_cursor._text._format(view_cursor._start, view_cursor._end, {"CharColor": values["Color"]})
+        elif url == ".uno:TrackChanges":
+            controller._document._properties["RecordChanges"] = values["TrackChanges"]
+        else:
+            raise NotImplementedError(url)
+
+
+class ModuleManager(NameAccess):
+    def __init__(self):
+        super().__init__({module: {} for module in WRITER_MODULES})
+
+
+class MessageBox(UnoObject):
+    def __init__(self, office, type_msg, message):
+        super().__init__()
+        self._office, self._type_msg, self._message = office, type_msg, message
+
+    def execute(self):
+        self._office.messages.append((self._type_msg, self._message))
+        return 1
+
+
+class Toolkit(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def getDesktopWindow(self):
+        return None
+
+    def createMessageBox(self, parent, type_msg, buttons, title, message):
+        return MessageBox(self._office, type_msg, message)
+
+
+class PathSubstitution(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def substituteVariables(self, text, substitute):
+        return text.replace("$(user)", self._office.user_directory_url)
+
+
+class ServiceManager(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def createInstance(self, name):
+        return self._office._services[name]
+
+    def createInstanceWithContext(self, name, context):
+        return self._office._services[name]
+
+
+class ComponentContext(UnoObject):
+    def __init__(self, office):
+        super().__init__()
+        self._office = office
+
+    def getServiceManager(self):
+        return self._office._service_manager
+
+    def getByName(self, name):
+        return self._office._singletons[name]
+
+
+class FakeOffice:
+    """Holds one current document, the configuration and the UI configuration of a fake office session"""
+
+    def __init__(self, version="7.6.4.1", locale="ru-RU", user_directory=None):
+        self.version, self.locale = version, locale
+        self.user_directory_url = pathlib.Path(user_directory or tempfile.gettempdir()).absolute().as_uri()
+        self.context = ComponentContext(self)
+        self._service_manager = ServiceManager(self)
+        self._services = {
+            "com.sun.star.frame.Desktop": Desktop(self),
+            "com.sun.star.frame.DispatchHelper": DispatchHelper(),
+            "com.sun.star.frame.ModuleManager": ModuleManager(),
+            "com.sun.star.configuration.ConfigurationProvider": ConfigurationProvider(self),
+            "com.sun.star.awt.Toolkit": Toolkit(self),
+            "com.sun.star.util.PathSubstitution": PathSubstitution(self),
+        }
+        self._singletons = {
+            "/singletons/com.sun.star.frame.theGlobalEventBroadcaster": GlobalEventBroadcaster(),
+            "/singletons/com.sun.star.ui.theModuleUIConfigurationManagerSupplier":
+                ModuleUIConfigurationManagerSupplier(self),
+        }
+        self.document = None
+        self.reset()
+
+    def reset(self, document=None):
+        """Starts over with a fresh profile and the given current document"""
+        self.document = document
+        self.messages = []
+        self._ui_managers = {}
+        self._configuration = {
+            "/org.openoffice.Setup/Product": {"ooSetupVersionAboutBox": self.version},
+            "/org.openoffice.Setup/L10N": {"ooLocale": self.locale},
+        }
+
+    def select(self, start_fraction: float, end_fraction: float) -> None:
+        """Selects the body paragraphs between the fractions of the document with the view cursor"""
+        paragraphs = self.document._body._paragraphs
+        first = int((len(paragraphs) - 1) * start_fraction)
+        last = int((len(paragraphs) - 1) * end_fraction)
+        self.document._controller._properties["ViewCursor"]._select((first, 0), (last, len(paragraphs[last])))
+
+
+def build_document(pages: int, seed: int = 0) -> TextDocument:
+    """
+    Builds a synthetic document with words, digits and paired symbols,
+    every 50th paragraph has an unpaired one. Some paragraphs have a page number field showing digits,
+    a reviewer's comment over a word or a metadata field around a word.
+    One text frame and one 2x2 table go per PAGES_PER_FRAME and PAGES_PER_TABLE pages.
+    """
+    generator = random.Random(seed)
+    fields, templates, templates_marks = [], [], []
+    for index in range(200):
+        paragraph, marks = build_paragraph(generator, is_unpaired=index % 50 == 0), []
+        if index % TEMPLATES_PER_FIELD == 3:
+            field = TextField(PAGE_NUMBER_SERVICE, f"({generator.randint(1, 99)})")
+            paragraph = f"{paragraph[:-1]} {field._character}."
+            fields.append(field)
+        if index % TEMPLATES_PER_COMMENT == 5:
+            comment = Annotation()
+            comment._properties.update(Author=REVIEWER, Content="Check it")
+            comment._is_ranged = True
+            word_end = paragraph.index(" ")
+            paragraph = f"{paragraph[:word_end]}{comment._character}{paragraph[word_end:]}"
+            marks.append((0, comment))
+            fields.append(comment)
+        if index % TEMPLATES_PER_METADATA == 7:
+            word = generator.choice(WORDS)
+            paragraph = f"{Metadata(len(word))._character}{word} {paragraph}"
+            marks = [(offset + len(word) + 2, annotation) for offset, annotation in marks]
+        templates.append(paragraph)
+        templates_marks.append(marks)
+
+    paragraphs_count = pages * PARAGRAPHS_PER_PAGE
+    paragraphs = [templates[index % len(templates)] for index in range(paragraphs_count)]
+    marks = {
+        index: list(templates_marks[index % len(templates)]) for index in range(paragraphs_count)
+        if templates_marks[index % len(templates)]}
+    frames = [[templates[index % len(templates)]] for index in range(pages // PAGES_PER_FRAME)]
+    tables = {
+        index * PAGES_PER_TABLE * PARAGRAPHS_PER_PAGE: [
+            templates[(index + cell) % len(templates)] for cell in range(len(TABLE_CELL_NAMES))]
+        for index in range(pages // PAGES_PER_TABLE)}
+    return TextDocument(paragraphs, frames, tables, marks, fields)
+
+
+def build_paragraph(generator: random.Random, is_unpaired: bool) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < 1800 // PARAGRAPHS_PER_PAGE:
+        word = generator.choice(WORDS)
+        roll = generator.random()
+        if roll < 0.1:
+            word = str(generator.randint(1, 2024))
+        elif roll < 0.15:
+            word = f"«{word}»"
+        elif roll < 0.2:
+            word = f"({word} {generator.randint(1, 99)})"
+        words.append(word)
+    if is_unpaired:
+        words.insert(generator.randint(0, len(words)), generator.choice("«»()[]"))
+    return " ".join(words) + "."
+
+
+def install(office: FakeOffice) -> None:
+    """Registers the fake uno, unohelper and com.sun.star modules, call it before importing the extension"""
+    uno = types.ModuleType("uno")
+    uno.getComponentContext = lambda: office.context
+    uno.createUnoStruct = lambda name, *args: Struct()
+    uno.Any = Any
+    uno.fileUrlToSystemPath = lambda url: url2pathname(urlparse(url).path)
+    uno.invoke = lambda target, method_name, arguments: getattr(target, method_name)(
+        *(argument.value if isinstance(argument, Any) else argument for argument in arguments))
+
+    unohelper = types.ModuleType("unohelper")
+    unohelper.Base = type("Base", (), {})
+
+    frame_interfaces = ("XTerminateListener", "XDispatch", "XDispatchProvider", )
+    modules = {
+        "uno": uno,
+        "unohelper": unohelper,
+        "com.sun.star.awt": {"MessageBoxButtons": Struct(BUTTONS_OK=1), "KeyEvent": KeyEvent},
+        "com.sun.star.beans": {"UnknownPropertyException": UnknownPropertyException},
+        "com.sun.star.beans.PropertyAttribute": {"REMOVEABLE": 128},
+        "com.sun.star.container": {"NoSuchElementException": NoSuchElementException},
+        "com.sun.star.document": {"XDocumentEventListener": type("XDocumentEventListener", (), {})},
+        "com.sun.star.frame": {
+            **{name: type(name, (), {}) for name in frame_interfaces}, "FeatureStateEvent": Struct},
+        "com.sun.star.lang": {"IllegalArgumentException": IllegalArgumentException},
+        "com.sun.star.uno": {"RuntimeException": RuntimeException},
+    }
+    for name, content in modules.items():
+        parts = name.split(".")
+        for depth in range(1, len(parts)):
+            sys.modules.setdefault(".".join(parts[:depth]), types.ModuleType(".".join(parts[:depth])))
+        if isinstance(content, dict):
+            module = sys.modules.setdefault(name, types.ModuleType(name))
+            module.__dict__.update(content)
+        else:
+            sys.modules[name] = content
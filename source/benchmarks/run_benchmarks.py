@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Times the menu actions on synthetic documents in a fake office and counts their UNO calls.
+Run from the source directory: python benchmarks/run_benchmarks.py --pages 1 100 --json results.json
+
+UNO call counts don't depend on the machine, so comparing the JSON of two runs catches regressions.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import List, Dict, Any
+
+import fake_office
+from fake_office import FakeOffice, build_document, calls, ANNOTATION_SERVICE
+
+DIRECTORY_PYTHONPATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extension", "src", "pythonpath")
+DEFAULT_PAGES = (1, 10, 100, 1000, 10000, )
+# Action name and the fractions of the document selected before it runs, None for a collapsed cursor
+SCENARIOS = (
+    ("color_digits", None),
+    ("color_digits", (0.25, 0.75)),
+    ("check_pairs", None),
+    ("set_fonts", None),
+    ("switch_toolbar", None),
+    ("configure", None),
+)
+TOP_CALLS_COUNT = 3
+
+
+def run_scenario(office: FakeOffice, action: str, selection, pages: int, repeat: int) -> Dict[str, Any]:
+    """
+    Runs the action on a fresh document and profile every time
+    :return: Best wall time and the UNO calls of the last run
+    """
+    import core_functions
+    import item_functions
+
+    timings = []
+    for _ in range(repeat):
+        office.reset(build_document(pages))
+        if selection:
+            office.select(*selection)
+        calls.clear()
+
+        started = time.perf_counter()
+        getattr(item_functions, action)()
+        # NOTE: Jobs of run_as_job actions run in the worker thread of the document
+        worker = core_functions.get_job_queue(office.document).worker
+        if worker is not None:
+            worker.join()
+        timings.append(time.perf_counter() - started)
+        action_calls = Counter(calls)
+
+        if office.messages:
+            raise RuntimeError(f"{action} failed:\n{office.messages[0][1]}")
+        if office.document._locks or office.document._undo_manager._depth:
+            raise RuntimeError(f"{action} left controllers locked or an undo context open")
+        check_annotations(office.document)
+
+    return {
+        "action": action if not selection else f"{action}@{selection[0]}-{selection[1]}",
+        "pages": pages,
+        "seconds": min(timings),
+        "uno_calls": sum(action_calls.values()),
+        "top_calls": dict(action_calls.most_common(TOP_CALLS_COUNT)),
+    }
+
+
+def check_annotations(document) -> None:
+    """Makes sure every annotation of the pair checker marks a paired symbol, not a character next to it"""
+    from core_constants import DEFAULT_CHECKER_AUTHOR, CHECKER_PAIRS_TO_CHECK
+
+    symbols = {symbol for pair in CHECKER_PAIRS_TO_CHECK for symbol in pair}
+    for annotation in document._fields:
+        if annotation.supportsService(ANNOTATION_SERVICE) and annotation.Author == DEFAULT_CHECKER_AUTHOR:
+            marked = annotation.getAnchor().getString()
+            if marked not in symbols:
+                raise RuntimeError(f"An annotation marks {marked!r} instead of a paired symbol")
+
+
+def run_benchmarks(pages_list: List[int], actions: List[str], repeat: int) -> List[Dict[str, Any]]:
+    office = FakeOffice()
+    fake_office.install(office)
+    sys.path.insert(0, DIRECTORY_PYTHONPATH)
+
+    results = []
+    for action, selection in SCENARIOS:
+        if actions and action not in actions:
+            continue
+        for pages in pages_list:
+            result = run_scenario(office, action, selection, pages, repeat)
+            print(
+                f"{result['action']:<24} {pages:>6} pages {result['seconds'] * 1000:>10.1f} ms "
+                f"{result['uno_calls']:>9} UNO calls  "
+                f"{', '.join(f'{name} {number}' for name, number in result['top_calls'].items())}")
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the menu actions in a fake office")
+    parser.add_argument(
+        "--pages", type=int, nargs="+", default=DEFAULT_PAGES,
+        help="sizes of the synthetic documents in pages")
+    parser.add_argument(
+        "--actions", nargs="+", choices=sorted({action for action, _ in SCENARIOS}),
+        help="actions to run, all by default")
+    parser.add_argument(
+        "--repeat", type=int, default=1,
+        help="runs per measurement, the best time is reported")
+    parser.add_argument(
+        "--json", metavar="PATH",
+        help="write the results as JSON to compare runs")
+    arguments = parser.parse_args()
+
+    benchmark_results = run_benchmarks(arguments.pages, arguments.actions, arguments.repeat)
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as file:
+            json.dump(benchmark_results, file, indent=2, ensure_ascii=False)
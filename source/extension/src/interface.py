@@ -1,45 +1,89 @@
 # coding: utf-8
+import time
+_registration_started = time.perf_counter()
+
+import os
+import sys
+from datetime import datetime
+from importlib import import_module
 from traceback import format_exc as tb
 
 import unohelper
-from com.sun.star.task import XJobExecutor
+from com.sun.star.frame import XDispatch, XDispatchProvider, FeatureStateEvent
 
 from core_constants import BTN_CHECK_PAIRS, BTN_DOTTED_UNDERLINE, \
     BTN_CONFIGURE, BTN_SWITCH_TOOLBAR, BTN_INSERT_ACCENT, \
-    BTN_SET_FONTS, BTN_COLOR_DIGITS, ItemData
+    BTN_SET_FONTS, BTN_COLOR_DIGITS, ITEMS_BY_COMMAND, PROTOCOL_HANDLER_NAME
+
+# Path of the file to append the registration timing to, unset by default
+STARTUP_REPORT_VARIABLE = "LOMENU_STARTUP_REPORT"
+ACTIONS_MODULE = "item_functions"
+
+
+class Dispatcher(unohelper.Base, XDispatch):
+    """One dispatch object runs every command of the extension for the whole session"""
+
+    def dispatch(self, url, args):
+        action_name = item_actions[ITEMS_BY_COMMAND[url.Complete].name]
+        try:
+            # NOTE: Actions are imported on the first click, not on office start
+            from core_tracing import trace_action
+            with trace_action(action_name):
+                getattr(import_module(ACTIONS_MODULE), action_name)()
+        except Exception:
+            from core_functions import error_box
+            error_box(tb())
+
+    def addStatusListener(self, listener, url):
+        state = FeatureStateEvent()
+        state.FeatureURL = url
+        state.IsEnabled = True
+        state.Source = self
+        listener.statusChanged(state)
+
+    def removeStatusListener(self, listener, url):
+        pass
+
 
-from core_functions import error_box
+class ProtocolHandler(unohelper.Base, XDispatchProvider):
+    def __init__(self, ctx, *args):
+        self.ctx = ctx
 
-from item_functions import color_digits, set_fonts, check_pairs, \
-    insert_accent, dotted_underline, switch_toolbar, configure
+    def queryDispatch(self, url, target_frame_name, search_flags):
+        return dispatcher if url.Complete in ITEMS_BY_COMMAND else None
 
+    def queryDispatches(self, requests):
+        return tuple(
+            self.queryDispatch(request.FeatureURL, request.FrameName, request.SearchFlags)
+            for request in requests)
 
-def item_factory(execute):
 
-    class Item(unohelper.Base, XJobExecutor):
-        def __init__(self, ctx):
-            self.ctx = ctx
+def report_startup_time(started: float, commands_count: int) -> None:
+    report_path = os.environ.get(STARTUP_REPORT_VARIABLE)
+    if not report_path:
+        return
 
-        def trigger(self, args):
-            try:
-                execute()
-            except Exception:
-                error_box(tb())
-    return Item
+    elapsed = (time.perf_counter() - started) * 1000
+    loaded = [name for name in ("core_functions", ACTIONS_MODULE) if name in sys.modules]
+    with open(report_path, "a", encoding="utf-8") as report:
+        report.write(
+            f"[{datetime.now():%y-%m-%d %H:%M:%S}] interface.py registered {commands_count} commands "
+            f"in {elapsed:.3f} ms, eagerly loaded modules: {', '.join(loaded) or 'none'}\n")
 
 
 item_actions = {
-    BTN_COLOR_DIGITS: color_digits,
-    BTN_SET_FONTS: set_fonts,
-    BTN_CHECK_PAIRS: check_pairs,
-    BTN_INSERT_ACCENT: insert_accent,
-    BTN_DOTTED_UNDERLINE: dotted_underline,
-    BTN_SWITCH_TOOLBAR: switch_toolbar,
-    BTN_CONFIGURE: configure,
+    BTN_COLOR_DIGITS: "color_digits",
+    BTN_SET_FONTS: "set_fonts",
+    BTN_CHECK_PAIRS: "check_pairs",
+    BTN_INSERT_ACCENT: "insert_accent",
+    BTN_DOTTED_UNDERLINE: "dotted_underline",
+    BTN_SWITCH_TOOLBAR: "switch_toolbar",
+    BTN_CONFIGURE: "configure",
 }
+dispatcher = Dispatcher()
 
 g_ImplementationHelper = unohelper.ImplementationHelper()
+g_ImplementationHelper.addImplementation(
+    ProtocolHandler, PROTOCOL_HANDLER_NAME, ("com.sun.star.frame.ProtocolHandler", ))
 
-for item_name, action in item_actions.items():
-    implementation = (item_factory(action), ItemData(item_name).url, ("com.sun.star.task.Job", ))
-    g_ImplementationHelper.addImplementation(*implementation)
+report_startup_time(_registration_started, len(ITEMS_BY_COMMAND))
@@ -1,33 +1,65 @@
 # coding: utf-8
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
-from datetime import datetime
+from typing import Dict
+from datetime import datetime, timezone
+
+try:
+    # NOTE: Generated by oxt_generator with the build version and the overrides of build variants
+    from core_variant import VARIANT_OVERRIDES
+except ImportError:
+    VARIANT_OVERRIDES = {}
 
 EXT_RELEASE_MAJOR = 0
 EXT_RELEASE_MINOR = 0
 EXT_RELEASE_PATCH = 1
 EXT_RELEASE_BUILD = "%d%H%M%S"
-EXTENSION_VERSION = f"{EXT_RELEASE_MAJOR}.{EXT_RELEASE_MINOR}.{EXT_RELEASE_PATCH}.{datetime.now().strftime(EXT_RELEASE_BUILD)}"
+# NOTE: Set it (Unix seconds) to make builds reproducible, see https://reproducible-builds.org/specs/source-date-epoch/
+BUILD_TIME_VARIABLE = "SOURCE_DATE_EPOCH"
+BUILD_TIME = datetime.fromtimestamp(int(os.environ[BUILD_TIME_VARIABLE]), timezone.utc) \
+    if os.environ.get(BUILD_TIME_VARIABLE) else datetime.now()
+EXTENSION_VERSION = VARIANT_OVERRIDES.get(
+    "EXTENSION_VERSION",
+    f"{EXT_RELEASE_MAJOR}.{EXT_RELEASE_MINOR}.{EXT_RELEASE_PATCH}.{BUILD_TIME.strftime(EXT_RELEASE_BUILD)}")
 
 EXTENSION_NAME = "lomenu"
 EXTENSION_AUTHOR = "torrua"
 EXTENSION_ID = f"org.{EXTENSION_AUTHOR}.extensions.{EXTENSION_NAME}"
 EXTENSION_TITLE = f"{EXTENSION_AUTHOR}'s features for LibreOffice"
+EXTENSION_PROTOCOL = f"{EXTENSION_ID}:"
+PROTOCOL_HANDLER_NAME = f"{EXTENSION_ID}.ProtocolHandler"
 
 FOLDER_ICONS = "icons"
 
-DEFAULT_FONT = "Arial"
-DEFAULT_FORMAT_WRITER_VALUE = "MS Word 2007 XML"
+DEFAULT_FONT = VARIANT_OVERRIDES.get("DEFAULT_FONT", "Arial")
+DEFAULT_FORMAT_WRITER_VALUE = VARIANT_OVERRIDES.get("DEFAULT_FORMAT_WRITER_VALUE", "MS Word 2007 XML")
 
 DEFAULT_CHECKER_AUTHOR = "Pair Checker"
 CHECKER_PAIRS_TO_CHECK = [("«", "»",), ("„", "“",), ("‚", "‘",), ("(", ")",), ("[", "]",), ("{", "}",), ]
-CHECKER_ESCAPED_CHARACTERS = ['(', ')', '[', ']', '{', '}', ]
+CHECKER_ANNOTATIONS_LIMIT = 500
+CHECKER_REGISTRY_PROPERTY = "PairCheckerRun"
+
+# Opt-in tracing of actions to a rotated JSON lines file in the user profile
+TRACE_VARIABLE = "LOMENU_TRACE"
+TRACING_ENABLED = bool(VARIANT_OVERRIDES.get("TRACING_ENABLED") or os.environ.get(TRACE_VARIABLE))
+TRACE_FILE_NAME = "lomenu_trace.jsonl"
+TRACE_MAX_BYTES = 1024 * 1024
+TRACE_BACKUP_COUNT = 3
 
 DEFAULT_COLOR = -1
+UNDO_TITLE_DEFAULT_COLOR = "Default color"
 COLOR_DECIMAL_RED = 12582912
 COLOR_DECIMAL_BLUE = 28864
 
+# (Python re pattern, attributes) applied by "Color digits" in one pass,
+# on overlaps earlier rules win the same attributes,
+# e.g. add (r"https?://\S+", {"CharUnderline": 1}) or (r"\b[A-Za-z]+\b", {"CharPosture": 2})
+FORMATTING_RULES = VARIANT_OVERRIDES.get("FORMATTING_RULES") or [
+    (r"\d+", {"CharColor": COLOR_DECIMAL_RED}),
+]
+
 COLOR_REVISION_TEXT_DISPLAY_DELETE = 16711680
 COLOR_REVISION_TEXT_DISPLAY_INSERT = 43315
 
@@ -35,7 +67,11 @@ SYS_CHAR_ACCENT = 769
 
 LANGUAGE_RU = "RU"
 LANGUAGE_EN = "EN"
-DEFAULT_UI_LANGUAGE = LANGUAGE_RU
+DEFAULT_UI_LANGUAGE = VARIANT_OVERRIDES.get("DEFAULT_UI_LANGUAGE", LANGUAGE_RU)
+UI_LANGUAGE_LOCALES = {
+    LANGUAGE_RU: "ru-RU",
+    LANGUAGE_EN: "en-US",
+}
 
 # =========================== URL DATA =================================
 
@@ -78,7 +114,7 @@ BTN_CONFIGURE = "BTN_CONFIGURE"
 BTN_CHECK_PAIRS = "BTN_CHECK_PAIRS"
 BTN_INSERT_ACCENT = "BTN_INSERT_ACCENT"
 
-UI_ELEMENT_LABELS = {
+UI_ELEMENT_LABELS = VARIANT_OVERRIDES.get("UI_ELEMENT_LABELS") or {
     LANGUAGE_RU: {
         BTN_INSERT_ACCENT:          "Вставить ударение",
         BTN_DOTTED_UNDERLINE:       "Подчеркнуть пунктиром",
@@ -100,72 +136,32 @@ UI_ELEMENT_LABELS = {
 }
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class ItemData:
+    # NOTE: Manual slots instead of slots=True to support Python < 3.10 bundled with the office
+    __slots__ = ("name", "url", "execute", "command", "labels", )
     name: str
-
-    @property
-    def url(self) -> str:
-        return f'{EXTENSION_ID}.{self.name}'
-
-    @property
-    def execute(self) -> str:
-        return f"service:{self.url}?execute"
-
-    @property
-    def image_node(self) -> str:
-        return f"""
-      <node oor:name="{self.url}" oor:op="replace">
-        <prop oor:name="URL">
-          <value>{self.execute}</value>
-        </prop>
-        <node oor:name="UserDefinedImages">
-          <prop oor:name="ImageSmallURL" oor:type="xs:string">
-            <value>%origin%/{FOLDER_ICONS}/{self.name}.png</value>
-          </prop>
-          <prop oor:name="ImageBigURL" oor:type="xs:string">
-            <value>%origin%/{FOLDER_ICONS}/{self.name}.png</value>
-          </prop>
-        </node>
-      </node>
-"""
-
-    def menu_node(self, number:  int) -> str:
-        return f"""
-          <!-- {self.name} -->
-          <node oor:name="N{number:03d}" oor:op="replace">
-            <prop oor:name="URL" oor:type="xs:string">
-              <value>{self.execute}</value>
-            </prop>
-
-            <prop oor:name="Title" oor:type="xs:string">
-              <value/>
-              <value xml:lang="en-US">{self.label_text(LANGUAGE_EN)}</value>
-              <value xml:lang="ru-RU">{self.label_text(LANGUAGE_RU)}</value>
-            </prop>
-
-            <prop oor:name="Target" oor:type="xs:string">
-              <value>_self</value>
-            </prop>
-
-            <prop oor:name="Context" oor:type="xs:string">
-              <value>{URL_WRITER_MODULE}</value>
-            </prop>
-          </node>
-"""
+    url: str
+    # NOTE: Job URL of the versions before the protocol handler, kept to find their toolbar buttons
+    execute: str
+    command: str
+    labels: Dict[str, str]
+
+    @classmethod
+    def create(cls, name: str) -> ItemData:
+        url = f"{EXTENSION_ID}.{name}"
+        labels = {language: language_labels.get(name) for language, language_labels in UI_ELEMENT_LABELS.items()}
+        return cls(name, url, f"service:{url}?execute", f"{EXTENSION_PROTOCOL}{name}", labels)
 
     def label_text(self, language: str) -> str:
-        return UI_ELEMENT_LABELS.get(language).get(self.name)
-
-    @staticmethod
-    def generate_images_nodes(button_names: list) -> str:
-        return "".join([ItemData(name).image_node for name in button_names])
+        return self.labels[language] if language in self.labels else self.labels.get(DEFAULT_UI_LANGUAGE)
 
-    @staticmethod
-    def generate_submenu_nodes(button_names: list) -> str:
-        return "".join([ItemData(name).menu_node(index) for index, name in enumerate(button_names, 1)])
 
+# NOTE: Built once, use ITEMS[name] instead of creating ItemData
+ITEMS = {name: ItemData.create(name) for name in UI_ELEMENT_LABELS.get(DEFAULT_UI_LANGUAGE)}
+ITEMS_BY_COMMAND = {item.command: item for item in ITEMS.values()}
 
-ITEM_NAMES = list(UI_ELEMENT_LABELS.get(DEFAULT_UI_LANGUAGE).keys())
+ITEM_NAMES = VARIANT_OVERRIDES.get("ITEM_NAMES") or list(ITEMS)
 TOOLBAR_BUTTONS_NAMES = [btn for btn in ITEM_NAMES if btn not in (BTN_CONFIGURE, BTN_SWITCH_TOOLBAR)]
-TOOLBAR_BUTTONS_EXECUTIONS = [ItemData(name).execute for name in TOOLBAR_BUTTONS_NAMES]
+TOOLBAR_BUTTONS_COMMANDS = frozenset(
+    command for name in TOOLBAR_BUTTONS_NAMES for command in (ITEMS[name].command, ITEMS[name].execute))
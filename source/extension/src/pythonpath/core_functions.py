@@ -2,15 +2,30 @@
 """
 Core and Support LibreOffice functions
 """
+import functools
+import itertools
+import re
 import threading
 import time
-from typing import Tuple, NamedTuple
+import uuid
+from collections import deque
+from traceback import format_exc as tb
+from typing import Tuple, NamedTuple, Iterable, Iterator, List, Optional, Dict, Any
 from collections import namedtuple
 
 import uno
+import unohelper
 from com.sun.star.awt import MessageBoxButtons
+from com.sun.star.beans import UnknownPropertyException
+from com.sun.star.beans.PropertyAttribute import REMOVEABLE
+from com.sun.star.container import NoSuchElementException
+from com.sun.star.document import XDocumentEventListener
+from com.sun.star.frame import XTerminateListener
+from com.sun.star.lang import IllegalArgumentException
+from com.sun.star.uno import RuntimeException as UnoRuntimeException
 
-from core_constants import URL_WRITER_MODULE
+from core_constants import URL_WRITER_MODULE, ITEMS
+from core_tracing import count_calls, traced
 
 
 def get_context():
@@ -20,13 +35,8 @@ def get_context():
 def app_version() -> NamedTuple:
     AppVersion = namedtuple('AppVersion', ['major', 'minor', "patch"])
 
-    sm = uno.getComponentContext().ServiceManager
-    service = sm.createInstanceWithContext(
-        "com.sun.star.configuration.ConfigurationProvider",
-        uno.getComponentContext())
-
     pv = {"nodepath": "/org.openoffice.Setup/Product", }
-    settings = service.createInstanceWithArguments(
+    settings = get_configuration_provider().createInstanceWithArguments(
         "com.sun.star.configuration.ConfigurationAccess", structify(pv))
     version_info = settings.getByName("ooSetupVersionAboutBox").split(".")
     version_values = list(map(int, version_info[:3]))
@@ -39,9 +49,7 @@ def get_service_manager():
 
 
 def get_desktop():
-    sm = get_service_manager()
-    return sm.createInstanceWithContext(
-        "com.sun.star.frame.Desktop", get_context())
+    return create_instance("com.sun.star.frame.Desktop", True)
 
 
 def get_open_documents():
@@ -59,17 +67,70 @@ def get_open_documents():
     return open_documents
 
 
+@count_calls
 def get_current_document():
-    sm = get_service_manager()
-    return sm.createInstanceWithContext(
-        "com.sun.star.frame.Desktop",
-        get_context()).getCurrentComponent()
+    return get_desktop().getCurrentComponent()
+
+
+# Stateless services are created once per process
+CACHED_SERVICES = (
+    "com.sun.star.frame.Desktop",
+    "com.sun.star.frame.DispatchHelper",
+    "com.sun.star.frame.ModuleManager",
+    "com.sun.star.configuration.ConfigurationProvider",
+    "com.sun.star.awt.Toolkit",
+)
+_services_cache = {}
+_services_listener = None
+_document_close_callbacks = []
+
+
+class ServicesListener(unohelper.Base, XDocumentEventListener, XTerminateListener):
+    def documentEventOccured(self, event):
+        if event.EventName != "OnUnload":
+            return
+        for callback in _document_close_callbacks:
+            callback(event.Source)
+
+    def queryTermination(self, event):
+        pass
 
+    def notifyTermination(self, event):
+        _services_cache.clear()
 
+    def disposing(self, event):
+        _services_cache.clear()
+
+
+@count_calls
 def create_instance(name, with_context=False):
+    instance = _services_cache.get(name)
+    if instance is not None:
+        return instance
+
     sm = get_service_manager()
-    return sm.createInstanceWithContext(name, get_context()) \
+    instance = sm.createInstanceWithContext(name, get_context()) \
         if with_context else sm.createInstance(name)
+    if name in CACHED_SERVICES:
+        _services_cache[name] = instance
+        watch_services()
+    return instance
+
+
+def watch_services():
+    global _services_listener
+    if _services_listener is not None:
+        return
+
+    _services_listener = ServicesListener()
+    get_desktop().addTerminateListener(_services_listener)
+    broadcaster = get_context().getByName("/singletons/com.sun.star.frame.theGlobalEventBroadcaster")
+    broadcaster.addDocumentEventListener(_services_listener)
+
+
+def on_document_close(callback) -> None:
+    """Registers callback(document) to drop cached data of a closing document."""
+    _document_close_callbacks.append(callback)
 
 
 def msgbox(message, title='LibreOffice', buttons=MessageBoxButtons.BUTTONS_OK, type_msg='infobox'):
@@ -91,6 +152,7 @@ def error_box(message):
     msgbox(message, type_msg='errorbox')
 
 
+@count_calls
 def structify(key_pairs) -> Tuple:
     result = []
     for key, value in key_pairs.items():
@@ -101,14 +163,16 @@ def structify(key_pairs) -> Tuple:
     return tuple(result)
 
 
+@count_calls
 def call_dispatch(doc, url, args=()):
     frame = doc.getCurrentController().getFrame()
     dispatch = create_instance('com.sun.star.frame.DispatchHelper')
     dispatch.executeDispatch(frame, url, '', 0, args)
 
 
-def get_selection():
-    doc = get_current_document()
+@count_calls
+def get_selection(doc=None):
+    doc = get_current_document() if doc is None else doc
     view_cursor = doc.getCurrentController().getViewCursor()
     selection = view_cursor.getText().createTextCursorByRange(view_cursor)
     return selection
@@ -130,6 +194,182 @@ def get_right_cursor():
     return cursor
 
 
+TextChunk = namedtuple('TextChunk', ['paragraph_index', 'offset', 'text', 'text_range'])
+
+
+def iter_texts(document=None) -> Iterator:
+    """Yields the body text of the document and then texts of its frames."""
+    document = get_current_document() if document is None else document
+    yield document.getText()
+
+    frames = document.getTextFrames()
+    for name in frames.getElementNames():
+        yield frames.getByName(name).getText()
+
+
+# Page style switches of headers and footers with their texts, the first page text is missing before LO 4.0
+HEADER_FOOTER_TEXTS = {
+    "HeaderIsOn": ("HeaderText", "HeaderTextLeft", "HeaderTextFirst"),
+    "FooterIsOn": ("FooterText", "FooterTextLeft", "FooterTextFirst"),
+}
+
+
+def iter_all_texts(document=None) -> Iterator:
+    """Yields the body and frames texts, then cells of all tables and headers and footers of used page styles."""
+    document = get_current_document() if document is None else document
+    yield from iter_texts(document)
+
+    tables = document.getTextTables()
+    for name in tables.getElementNames():
+        table = tables.getByName(name)
+        for cell_name in table.getCellNames():
+            yield table.getCellByName(cell_name)
+
+    yield from iter_header_footer_texts(document)
+
+
+def iter_header_footer_texts(document) -> Iterator:
+    """Yields texts of headers and footers of page styles in use."""
+    page_styles = document.getStyleFamilies().getByName("PageStyles")
+    for style_name in page_styles.getElementNames():
+        style = page_styles.getByName(style_name)
+        if not style.isInUse():
+            continue
+        for switch, text_names in HEADER_FOOTER_TEXTS.items():
+            if not style.getPropertyValue(switch):
+                continue
+            for text_name in text_names:
+                try:
+                    text = style.getPropertyValue(text_name)
+                except UnknownPropertyException:
+                    continue
+                if text is not None:
+                    yield text
+
+
+def set_all_texts_properties(attrs: dict, document=None) -> None:
+    """
+    Sets character properties on every text of the document without selecting it,
+    so the view cursor stays where it was.
+    """
+    names, values = tuple(attrs.keys()), tuple(attrs.values())
+    for text in iter_all_texts(document):
+        cursor = text.createTextCursorByRange(text.getStart())
+        cursor.gotoEnd(True)
+        cursor.setPropertyValues(names, values)
+
+
+def iter_paragraph_elements(text) -> Iterator:
+    """Lazily yields paragraphs of the text, descending into text tables."""
+    enumeration = text.createEnumeration()
+
+    while enumeration.hasMoreElements():
+        element = enumeration.nextElement()
+        if element.supportsService("com.sun.star.text.TextTable"):
+            for cell_name in element.getCellNames():
+                yield from iter_paragraph_elements(element.getCellByName(cell_name))
+        elif element.supportsService("com.sun.star.text.Paragraph"):
+            yield element
+
+
+# Portions that are marks between characters, any other non text portion (a field, a footnote,
+# an object anchored as character, the end of a ranged annotation) is a single position for the text cursor
+ZERO_WIDTH_PORTION_TYPES = frozenset((
+    "Bookmark", "ReferenceMark", "DocumentIndexMark", "Redline", "SoftPageBreak", "Ruby", ))
+# Portions with text inside after their own character, by the property holding the nested content
+NESTED_PORTION_PROPERTIES = {
+    "InContentMetadata": "NestedTextContent",
+    "ContentControl": "ContentControl",
+}
+PORTION_PLACEHOLDER = "\ufffc"
+
+
+def get_portion_string(portion, portion_type: str) -> str:
+    """Returns the part of the cursor string the portion takes, see get_cursor_string."""
+    if portion_type == "Text":
+        return portion.getString()
+    if portion_type in NESTED_PORTION_PROPERTIES:
+        nested_content = portion.getPropertyValue(NESTED_PORTION_PROPERTIES[portion_type])
+        return PORTION_PLACEHOLDER + get_cursor_string(nested_content)
+    if portion_type in ZERO_WIDTH_PORTION_TYPES:
+        return ""
+    # NOTE: A ranged annotation starts with an empty mark and has its character at the end, "AnnotationEnd",
+    # only an annotation at a point has its character in the "Annotation" portion
+    if portion_type == "Annotation" and is_collapsed_range(portion):
+        return ""
+    return PORTION_PLACEHOLDER
+
+
+def is_collapsed_range(text_range) -> bool:
+    return text_range.getText().compareRegionStarts(text_range.getStart(), text_range.getEnd()) == 0
+
+
+def get_cursor_string(element) -> str:
+    """
+    Returns the text of the paragraph (or of the nested content) with one placeholder per field or object,
+    so offsets in it are cursor positions.
+    getString() of the paragraph expands fields to their shown text and skips annotations.
+    """
+    parts = []
+    portions = element.createEnumeration()
+
+    while portions.hasMoreElements():
+        portion = portions.nextElement()
+        parts.append(get_portion_string(portion, portion.TextPortionType))
+    return "".join(parts)
+
+
+def iter_paragraphs(
+        document=None, seen: Optional[Dict[int, int]] = None, headers_footers: bool = False) -> Iterator[TextChunk]:
+    """
+    Lazily yields one TextChunk per paragraph of the body, tables and frames,
+    and of headers and footers if asked, its text is the cursor string, see get_cursor_string.
+    When seen is given, it maps paragraph indexes to hashes of their text:
+    unchanged paragraphs are skipped and the hashes of the others are updated.
+    """
+    document = get_current_document() if document is None else document
+    texts = iter_texts(document)
+    if headers_footers:
+        texts = itertools.chain(texts, iter_header_footer_texts(document))
+    paragraphs = (paragraph for text in texts for paragraph in iter_paragraph_elements(text))
+
+    for index, paragraph in enumerate(paragraphs):
+        text = get_cursor_string(paragraph)
+        if seen is not None:
+            text_hash = hash(text)
+            if seen.get(index) == text_hash:
+                continue
+            seen[index] = text_hash
+        yield TextChunk(index, 0, text, paragraph)
+
+
+def iter_selected_paragraphs(selection) -> Iterator[TextChunk]:
+    """
+    Lazily yields one TextChunk per selected paragraph, including the ones of selected tables,
+    the first and the last paragraphs are cut to the selection.
+    """
+    for index, paragraph in enumerate(iter_paragraph_elements(selection)):
+        yield TextChunk(index, 0, get_cursor_string(paragraph), paragraph)
+
+
+def iter_text_portions(document=None, seen: Optional[Dict[int, int]] = None) -> Iterator[TextChunk]:
+    """
+    Lazily yields plain text portions of paragraphs,
+    offsets are cursor positions counted from the start of the paragraph.
+    """
+    for chunk in iter_paragraphs(document, seen):
+        offset = 0
+        portions = chunk.text_range.createEnumeration()
+
+        while portions.hasMoreElements():
+            portion = portions.nextElement()
+            portion_type = portion.TextPortionType
+            text = get_portion_string(portion, portion_type)
+            if portion_type == "Text":
+                yield TextChunk(chunk.paragraph_index, offset, text, portion)
+            offset += len(text)
+
+
 def insert_string(string, attrs: dict = None):
     attrs = dict() if not attrs else attrs
 
@@ -164,6 +404,7 @@ def get_configuration_provider():
         "com.sun.star.configuration.ConfigurationProvider", True)
 
 
+@count_calls
 def get_node_configuration(node_path):
     args = {
         "nodepath": node_path
@@ -175,19 +416,70 @@ def get_node_configuration(node_path):
     return configuration
 
 
-def set_key_for_command(key, command, remove=False):
-    module_manager = create_instance("com.sun.star.frame.ModuleManager")
-    list_modules = list(module_manager.getElementNames())
+def apply_settings_profile(profile: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Applies {node path: {property: value}} settings, e.g. {MISC_NODE_PATH: {"CrashReport": False}},
+    nested properties are set by hierarchical names like "Delete/Color".
+    Every node is opened once and committed only if some of its values really change.
+    """
+    for node_path, settings in profile.items():
+        node = get_node_configuration(node_path)
+        names = tuple(settings.keys())
+        current_values = node.getHierarchicalPropertyValues(names)
+        changed = {
+            name: settings[name]
+            for name, current_value in zip(names, current_values)
+            if current_value != settings[name]}
+        if not changed:
+            continue
+
+        node.setHierarchicalPropertyValues(tuple(changed.keys()), tuple(changed.values()))
+        node.commitChanges()
+
+
+def set_key_for_command(key, command, remove=False, modules: Iterable[str] = None):
+    set_keys_for_commands([(key, command)], remove, modules)
+
+
+def set_keys_for_commands(bindings: List[Tuple], remove=False, modules: Iterable[str] = None) -> None:
+    """
+    Binds (or unbinds) every (key_event, command) pair in the modules, all of them by default.
+    Current bindings are read first, so only modules with a changed mapping are stored.
+    """
+    if modules is None:
+        module_manager = create_instance("com.sun.star.frame.ModuleManager")
+        modules = module_manager.getElementNames()
 
-    for module in list_modules:
+    for module in modules:
         ui_configuration_manager = get_ui_configuration_manager(module)
         shortcut_manager = ui_configuration_manager.getShortCutManager()
-        if not remove:
-            shortcut_manager.setKeyEvent(key, command)
-        else:
-            shortcut_manager.removeCommandFromAllKeyEvents(key, command)
-        # NOTE: Don't remove this or our key will not save!!
-        shortcut_manager.store()
+        is_changed = False
+
+        for key, command in bindings:
+            if remove and is_command_bound(shortcut_manager, command):
+                shortcut_manager.removeCommandFromAllKeyEvents(command)
+                is_changed = True
+            elif not remove and not is_key_bound_to_command(shortcut_manager, key, command):
+                shortcut_manager.setKeyEvent(key, command)
+                is_changed = True
+
+        if is_changed:
+            # NOTE: Don't remove this or our key will not save!!
+            shortcut_manager.store()
+
+
+def is_key_bound_to_command(shortcut_manager, key, command) -> bool:
+    try:
+        return shortcut_manager.getCommandByKeyEvent(key) == command
+    except NoSuchElementException:
+        return False
+
+
+def is_command_bound(shortcut_manager, command) -> bool:
+    try:
+        return bool(shortcut_manager.getKeyEventsByCommand(command))
+    except (NoSuchElementException, IllegalArgumentException):
+        return False
 
 
 def get_document_language():
@@ -195,22 +487,45 @@ def get_document_language():
     return selection.CharLocale.Language
 
 
+@functools.lru_cache(maxsize=1)
 def get_ui_language():
+    # NOTE: The office applies a new UI language only after a restart
     lo_lang_node_path = "/org.openoffice.Setup/L10N"
     configuration = get_node_configuration(lo_lang_node_path)
     return configuration.ooLocale[0:2]
 
 
-class NodeConfigurationManager:
-    def __init__(self, node_path):
-        self.node_path = node_path
-        self.node = get_node_configuration(node_path)
+class ControllersLock:
+    def __init__(self, document=None):
+        self.document = get_current_document() if document is None else document
+
+    def __enter__(self):
+        self.document.lockControllers()
+        return self.document
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.document.unlockControllers()
+
+
+class UndoContext:
+    """
+    Makes the changes inside one undo step with the title
+    and keeps controllers locked, so the layout is recalculated once at the end.
+    """
+
+    def __init__(self, title: str, document=None):
+        self.document = get_current_document() if document is None else document
+        self.title = title
+        self.undo_manager = self.document.getUndoManager()
 
     def __enter__(self):
-        return self.node
+        self.undo_manager.enterUndoContext(self.title)
+        self.document.lockControllers()
+        return self.document
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.node.commitChanges()
+        self.document.unlockControllers()
+        self.undo_manager.leaveUndoContext()
 
 
 class ModuleConfigurationManager:
@@ -219,6 +534,7 @@ class ModuleConfigurationManager:
         self.module_configuration_manager = get_ui_configuration_manager(URL_WRITER_MODULE)
         self.toolbar_settings = self.module_configuration_manager.getSettings(self.standard_bar, True)
         self.count = self.toolbar_settings.getCount()
+        self.command_positions = self.index_commands()
 
     def __enter__(self):
         return self
@@ -228,6 +544,18 @@ class ModuleConfigurationManager:
         # NOTE: Don't remove this or our button will not save after restart!!
         self.module_configuration_manager.store()
 
+    def index_commands(self) -> Dict[str, List[int]]:
+        """Maps command URLs of the toolbar buttons to their positions in one pass."""
+        positions = {}
+        for index in range(self.count):
+            for prop in self.toolbar_settings.getByIndex(index):
+                if prop.Name == "CommandURL":
+                    positions.setdefault(prop.Value, []).append(index)
+        return positions
+
+    def find_commands(self, commands: Iterable[str]) -> List[int]:
+        return sorted(index for command in set(commands) for index in self.command_positions.get(command, ()))
+
     def invoke(self, index, method_name, arg_tuple):
         uno.invoke(
             self.toolbar_settings, method_name,
@@ -244,65 +572,349 @@ class ModuleConfigurationManager:
         uno.invoke(self.toolbar_settings, "removeByIndex", (index, ))
 
 
-def run_in_thread(fn):
-    def run(*k, **kw):
-        t = threading.Thread(target=fn, args=k, kwargs=kw)
-        t.start()
-        return t
-    return run
+class DocumentJobQueue:
+    """Runs jobs of one document one by one in a single worker thread."""
+
+    def __init__(self, document):
+        self.document = document
+        self.jobs = deque()
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.worker = None
+        self.running_key = None
+        self.running_started = 0.0
+        self.is_running_cancellable = False
+
+    def submit(self, key, label: str, job, cancellable: bool = True) -> bool:
+        """
+        Queues the job unless the same one is pending or running.
+        Submitting the running cancellable job again after JOB_REPEAT_INTERVAL cancels it,
+        earlier it's a double click.
+        """
+        with self.lock:
+            if key == self.running_key:
+                if self.is_running_cancellable and time.monotonic() - self.running_started >= JOB_REPEAT_INTERVAL:
+                    self.cancelled.set()
+                return False
+            if any(pending_key == key for pending_key, *_ in self.jobs):
+                return False
+            self.jobs.append((key, label, job, cancellable))
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, daemon=True)
+                self.worker.start()
+        return True
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.jobs.clear()
+            self.cancelled.set()
+
+    def run(self) -> None:
+        _current_job.queue = self
+        try:
+            while self.run_next():
+                pass
+        finally:
+            with self.lock:
+                # NOTE: Even if the worker dies, the next submit starts a new one
+                if self.worker is threading.current_thread():
+                    self.worker = None
+                    self.running_key = None
+
+    def run_next(self) -> bool:
+        """Runs the first queued job, returns False when there are none."""
+        with self.lock:
+            if not self.jobs:
+                self.worker = None
+                return False
+            self.running_key, label, job, self.is_running_cancellable = self.jobs.popleft()
+            self.running_started = time.monotonic()
+            self.cancelled.clear()
+
+        indicator = None
+        try:
+            indicator = self.document.getCurrentController().getFrame().createStatusIndicator()
+            _current_job.indicator, _current_job.progress = indicator, 0
+            indicator.start(label, JOB_PROGRESS_RANGE)
+            job()
+        except Exception:
+            error_box(tb())
+        finally:
+            _current_job.indicator = None
+            with self.lock:
+                self.running_key = None
+            if indicator is not None:
+                indicator.end()
+        return True
+
+
+JOB_PROGRESS_RANGE = 100
+# Seconds after the start of a job when triggering it again cancels it instead of being a double click
+JOB_REPEAT_INTERVAL = 1.0
+_job_queues = {}
+_current_job = threading.local()
+
+
+def get_job_queue(document) -> DocumentJobQueue:
+    return _job_queues.setdefault(document.RuntimeUID, DocumentJobQueue(document))
+
+
+def cancel_jobs(document) -> None:
+    queue = _job_queues.pop(document.RuntimeUID, None)
+    if queue is not None:
+        queue.cancel()
+
+
+on_document_close(cancel_jobs)
+
+
+def get_job_document():
+    """Returns the document of the running job, the current document outside of jobs."""
+    queue = getattr(_current_job, "queue", None)
+    return get_current_document() if queue is None else queue.document
+
+
+def is_job_cancelled() -> bool:
+    queue = getattr(_current_job, "queue", None)
+    return queue is not None and queue.cancelled.is_set()
+
+
+def set_job_progress(done: int, total: int) -> None:
+    indicator = getattr(_current_job, "indicator", None)
+    if indicator is None or not total:
+        return
+    value = min(done * JOB_PROGRESS_RANGE // total, JOB_PROGRESS_RANGE)
+    # NOTE: Only touch the status bar when the shown value really changes
+    if value != _current_job.progress:
+        _current_job.progress = value
+        indicator.setValue(value)
+
+
+def get_item_label(item_name: str) -> str:
+    return ITEMS[item_name].label_text(get_ui_language().upper())
+
+
+def run_as_job(item_name: str, cancellable: bool = True):
+    """
+    Runs the decorated action in the job queue of the current document,
+    the action gets the document by get_job_document, as another one may be current by then.
+    Identical pending or running calls are dropped, so double clicks don't run twice,
+    and triggering the running action again later cancels it, unless it's not cancellable.
+    """
+    def decorator(fn):
+        job_fn = traced(fn.__name__, "job")(fn)
+
+        @functools.wraps(fn)
+        def run(*k, **kw):
+            label = get_item_label(item_name)
+            key = (fn.__name__, k, tuple(sorted(kw.items())))
+            queue = get_job_queue(get_current_document())
+            return queue.submit(key, label, functools.partial(job_fn, *k, **kw), cancellable)
+        return run
+    return decorator
+
+
+class ChangesRecordingOff:
+    """
+    Turns recording of changes off until exit, even if an error happens.
+    Nested blocks restore the state they found, so the outer one switches recording back on.
+    """
+
+    def __init__(self, document=None):
+        self.document = get_current_document() if document is None else document
+        self.is_recording = False
+
+    def __enter__(self):
+        self.is_recording = self.document.RecordChanges
+        if self.is_recording:
+            self.document.RecordChanges = False
+        return self.document
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if self.is_recording:
+            self.document.RecordChanges = True
 
 
 def disable_tracking(func):
-    def wrapper():
-        doc = get_current_document()
-        is_changes_record = doc.RecordChanges
-        args_track_record = {"TrackChanges": False}
-        call_dispatch(doc, ".uno:TrackChanges", structify(args_track_record))
-        func()
-        args_track_record = {"TrackChanges": is_changes_record}
-        call_dispatch(doc, ".uno:TrackChanges", structify(args_track_record))
+    @functools.wraps(func)
+    def wrapper(*k, **kw):
+        with ChangesRecordingOff(get_job_document()):
+            return func(*k, **kw)
     return wrapper
 
 
-def change_font_by_pattern(pattern: str, attrs: dict):
-    document = get_current_document()
-    text = document.Text
-    view_cursor = document.getCurrentController().getViewCursor()
+def change_font_by_pattern(pattern: str, attrs: dict, document=None):
+    apply_formatting_rules([(pattern, attrs)], document)
+
 
-    start = text.createTextCursorByRange(view_cursor.Start)
-    end = None if view_cursor.isCollapsed() else text.createTextCursorByRange(view_cursor.End)
+def apply_formatting_rules(rules: List[Tuple[str, dict]], document=None) -> None:
+    """
+    Applies (pattern, attrs) rules, e.g. [(r"\d+", {"CharColor": COLOR_DECIMAL_RED})],
+    to the selection or, if nothing is selected, to the body, tables, frames, headers and footers.
+    Patterns are Python re ones on every path. The paragraphs are read once, every pattern is matched
+    in the read text and all the found spans are formatted in one pass with controllers locked.
+    Rules are applied from the last to the first one, so where matches overlap
+    the earlier rule wins the attributes both set and the other attributes add up.
+    """
+    document = get_current_document() if document is None else document
+    if document.getCurrentController().getViewCursor().isCollapsed():
+        chunks, paragraph_count = iter_paragraphs(document, headers_footers=True), document.ParagraphCount
+    else:
+        chunks, paragraph_count = iter_selected_paragraphs(get_selection(document)), 0
 
-    replace_descriptor = document.createReplaceDescriptor()
-    replace_descriptor.SearchRegularExpression = True
-    replace_descriptor.SearchString = pattern
-    replace_descriptor.ReplaceString = "&"
-    replace_descriptor.setReplaceAttributes(structify(attrs))
+    paragraphs_spans = find_paragraphs_spans(chunks, rules, paragraph_count)
+    if paragraphs_spans:
+        format_paragraphs_spans(document, paragraphs_spans, rules)
 
-    if end is None:
-        document.replaceAll(replace_descriptor)
-        return
 
-    find = document.findNext(start.End, replace_descriptor)
-    while find and text.compareRegionEnds(find, end) >= 0:
-        find.setPropertyValues(tuple(attrs.keys()), tuple(attrs.values()))
-        find = document.findNext(find.End, replace_descriptor)
-
-
-def create_annotation(author: str = "author", content: str = ""):
-    def get_current_time():
-        t = time.localtime()
-        dtv = uno.createUnoStruct("com.sun.star.util.DateTime")
-        dtv.Year = t.tm_year
-        dtv.Month = t.tm_mon
-        dtv.Day = t.tm_mday
-        dtv.Hours = t.tm_hour
-        dtv.Minutes = t.tm_min
-        dtv.Seconds = t.tm_sec
-        dtv.NanoSeconds = 0
-        return dtv
-
-    anno = get_current_document().createInstance("com.sun.star.text.textfield.Annotation")
+def find_paragraphs_spans(
+        chunks: Iterable[TextChunk], rules: List[Tuple[str, dict]], paragraph_count: int = 0) -> Optional[List]:
+    """
+    Returns (text range, spans) of the paragraphs with matches of the rules, see find_formatting_spans,
+    or None if the job is cancelled. The job progress is shown when paragraph_count is given.
+    """
+    patterns = [re.compile(pattern) for pattern, _ in rules]
+    paragraphs_spans = []
+    for chunk in chunks:
+        if is_job_cancelled():
+            return None
+        spans = find_formatting_spans(chunk.text, patterns)
+        if spans:
+            paragraphs_spans.append((chunk.text_range, spans))
+        set_job_progress(chunk.paragraph_index, paragraph_count)
+    return paragraphs_spans
+
+
+def format_paragraphs_spans(document, paragraphs_spans: List, rules: List[Tuple[str, dict]]) -> None:
+    rules_values = [(tuple(attrs.keys()), tuple(attrs.values())) for _, attrs in rules]
+    with ControllersLock(document):
+        for text_range, spans in paragraphs_spans:
+            rule_index, cursor, position = None, None, 0
+            for start, end, span_rule_index in spans:
+                if span_rule_index != rule_index:
+                    # NOTE: One cursor walks all spans of a rule in the paragraph from left to right
+                    rule_index, position = span_rule_index, 0
+                    cursor = text_range.getText().createTextCursorByRange(text_range.getStart())
+                cursor.goRight(start - position, False)
+                cursor.goRight(end - start, True)
+                cursor.setPropertyValues(*rules_values[rule_index])
+                position = end
+
+
+def find_formatting_spans(text: str, patterns: List) -> List[Tuple[int, int, int]]:
+    """
+    Returns (start, end, rule index) spans of the matches of every pattern in the order to apply them:
+    rule by rule from the last to the first one, the spans of a rule from left to right.
+    Adjacent matches of the same rule are merged into one span.
+    """
+    spans = []
+    for rule_index in reversed(range(len(patterns))):
+        for found in patterns[rule_index].finditer(text):
+            if found.start() == found.end():
+                continue
+            if spans and spans[-1][1] == found.start() and spans[-1][2] == rule_index:
+                spans[-1] = (spans[-1][0], found.end(), rule_index)
+            else:
+                spans.append((found.start(), found.end(), rule_index))
+    return spans
+
+
+def get_current_date_time():
+    t = time.localtime()
+    dtv = uno.createUnoStruct("com.sun.star.util.DateTime")
+    dtv.Year = t.tm_year
+    dtv.Month = t.tm_mon
+    dtv.Day = t.tm_mday
+    dtv.Hours = t.tm_hour
+    dtv.Minutes = t.tm_min
+    dtv.Seconds = t.tm_sec
+    dtv.NanoSeconds = 0
+    return dtv
+
+
+def create_annotation(author: str = "author", content: str = "", document=None, date_time=None):
+    document = get_current_document() if document is None else document
+    anno = document.createInstance("com.sun.star.text.textfield.Annotation")
     anno.Content = content
     anno.Author = author
-    anno.DateTimeValue = get_current_time()
+    anno.DateTimeValue = get_current_date_time() if date_time is None else date_time
     return anno
+
+
+def select_characters(text_range, offset: int, length: int = 1):
+    cursor = text_range.getText().createTextCursorByRange(text_range.getStart())
+    cursor.goRight(offset, False)
+    cursor.goRight(length, True)
+    return cursor
+
+
+def insert_annotations(document, annotations: Iterable[Tuple], author: str = "author") -> List:
+    """Inserts (text_range, content) annotations sharing one timestamp with controllers locked."""
+    date_time = get_current_date_time()
+    inserted = []
+    with ControllersLock(document):
+        for text_range, content in annotations:
+            annotation = create_annotation(author, content, document, date_time)
+            text_range.getText().insertTextContent(text_range, annotation, True)
+            inserted.append(annotation)
+    return inserted
+
+
+def remove_text_contents(document, contents: Iterable) -> List:
+    """Removes the text contents and returns the ones that are not in the document any more."""
+    missing = []
+    with ControllersLock(document):
+        for content in contents:
+            try:
+                content.getAnchor().getText().removeTextContent(content)
+            except UnoRuntimeException:
+                # Already deleted from the document by the user or by an undo
+                missing.append(content)
+    return missing
+
+
+# Text contents created during this session, keyed by (document RuntimeUID, property name),
+# valid while the document's user defined property holds the same run id
+_text_contents_registry = {}
+
+
+def register_text_contents(document, property_name: str, contents: List) -> None:
+    """Remembers the contents for the next run, nothing is written to the document when there are none."""
+    properties = document.getDocumentProperties().getUserDefinedProperties()
+    has_property = properties.getPropertySetInfo().hasPropertyByName(property_name)
+    if not contents:
+        _text_contents_registry.pop((document.RuntimeUID, property_name), None)
+        if has_property:
+            properties.removeProperty(property_name)
+        return
+
+    run_id = uuid.uuid4().hex
+    if has_property:
+        properties.setPropertyValue(property_name, run_id)
+    else:
+        properties.addProperty(property_name, REMOVEABLE, run_id)
+    _text_contents_registry[(document.RuntimeUID, property_name)] = (run_id, contents)
+
+
+def pop_registered_text_contents(document, property_name: str) -> Optional[List]:
+    """
+    Returns None when the document has no registry from this session,
+    e.g. it was reopened, so the caller has to look for the contents itself.
+    """
+    properties = document.getDocumentProperties().getUserDefinedProperties()
+    if not properties.getPropertySetInfo().hasPropertyByName(property_name):
+        return None
+    run_id = properties.getPropertyValue(property_name)
+    properties.removeProperty(property_name)
+    registered_run_id, contents = _text_contents_registry.pop(
+        (document.RuntimeUID, property_name), (None, None))
+    return contents if registered_run_id == run_id else None
+
+
+def forget_text_contents(document) -> None:
+    uid = document.RuntimeUID
+    for key in [key for key in _text_contents_registry if key[0] == uid]:
+        del _text_contents_registry[key]
+
+
+on_document_close(forget_text_contents)
@@ -0,0 +1,127 @@
+# coding: utf-8
+"""
+Opt-in tracing: wall time of actions and calls of core_functions helpers,
+written as JSON lines to the user profile. Nothing is wrapped when tracing is off.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from core_constants import TRACING_ENABLED, TRACE_FILE_NAME, TRACE_MAX_BYTES, \
+    TRACE_BACKUP_COUNT, EXTENSION_VERSION
+
+_current_trace = threading.local()
+_trace_logger = None
+_trace_logger_lock = threading.Lock()
+
+
+class ActionTrace:
+    def __init__(self, action: str, kind: str):
+        self.action = action
+        self.kind = kind
+        self.helper_calls = Counter()
+        self.previous = None
+        self.started = None
+
+    def __enter__(self):
+        self.previous = getattr(_current_trace, "trace", None)
+        _current_trace.trace = self
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        seconds = time.perf_counter() - self.started
+        _current_trace.trace = self.previous
+        write_trace({
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "version": EXTENSION_VERSION,
+            "action": self.action,
+            "kind": self.kind,
+            "seconds": round(seconds, 6),
+            "helper_calls": dict(self.helper_calls),
+            "paragraphs": get_paragraph_count(),
+            "error": exc_type.__name__ if exc_type else None,
+        })
+
+
+def trace_action(action: str, kind: str = "dispatch"):
+    return ActionTrace(action, kind) if TRACING_ENABLED else nullcontext()
+
+
+def traced(action: str, kind: str):
+    def decorator(fn):
+        if not TRACING_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*k, **kw):
+            with ActionTrace(action, kind):
+                return fn(*k, **kw)
+        return wrapper
+    return decorator
+
+
+def count_calls(fn):
+    """Counts calls of the helper in the trace of the current thread."""
+    if not TRACING_ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*k, **kw):
+        trace = getattr(_current_trace, "trace", None)
+        if trace is not None:
+            trace.helper_calls[fn.__name__] += 1
+        return fn(*k, **kw)
+    return wrapper
+
+
+def get_paragraph_count() -> Optional[int]:
+    from core_functions import get_job_document
+    try:
+        return get_job_document().ParagraphCount
+    except Exception:
+        # Start center or another module without text
+        return None
+
+
+def get_trace_logger() -> Optional[logging.Logger]:
+    global _trace_logger
+    with _trace_logger_lock:
+        if _trace_logger is None:
+            _trace_logger = create_trace_logger()
+    return _trace_logger or None
+
+
+def create_trace_logger():
+    import uno
+    from core_functions import create_instance
+
+    user_directory = create_instance("com.sun.star.util.PathSubstitution", True).substituteVariables("$(user)", True)
+    try:
+        handler = RotatingFileHandler(
+            os.path.join(uno.fileUrlToSystemPath(user_directory), TRACE_FILE_NAME),
+            maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUP_COUNT, encoding="utf-8")
+    except OSError:
+        # NOTE: Tracing must never break the action, so it is off until restart
+        return False
+
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("lomenu.trace")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def write_trace(record: dict) -> None:
+    logger = get_trace_logger()
+    if logger:
+        logger.info(json.dumps(record, ensure_ascii=False))
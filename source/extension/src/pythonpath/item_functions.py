@@ -1,24 +1,27 @@
-from typing import Tuple, List
+import re
+from typing import Tuple, List, Dict, Any
 
 from com.sun.star.awt import KeyEvent as KEY_EVENT
 
 from core_constants import BTN_DOTTED_UNDERLINE, BTN_INSERT_ACCENT, \
-    TOOLBAR_BUTTONS_NAMES
+    BTN_SET_FONTS, BTN_COLOR_DIGITS, BTN_CHECK_PAIRS, TOOLBAR_BUTTONS_NAMES, TOOLBAR_BUTTONS_COMMANDS
 from core_constants import COLOR_REVISION_TEXT_DISPLAY_DELETE, COLOR_REVISION_TEXT_DISPLAY_INSERT, \
     REVISION_TEXT_DISPLAY_NODE_PATH, JOBS_UPDATE_CHECK_NODE_PATH, ANNOTATION_UNIT
 from core_constants import DEFAULT_FONT_NODE_PATH, DEFAULT_FONT, DEFAULT_COLOR, \
-    MISC_NODE_PATH, SYS_CHAR_ACCENT, CHECKER_PAIRS_TO_CHECK, CHECKER_ESCAPED_CHARACTERS
+    MISC_NODE_PATH, SYS_CHAR_ACCENT, CHECKER_PAIRS_TO_CHECK
 from core_constants import DEFAULT_FORMAT_WRITER_NODE_PATH, DEFAULT_FORMAT_WRITER_VALUE
-from core_constants import Key, URL_RESET_ATTRIBUTES, COLOR_DECIMAL_RED, \
-    ItemData, DEFAULT_CHECKER_AUTHOR
-from core_functions import NodeConfigurationManager as NCM
-from core_functions import get_current_document, call_dispatch, structify
-from core_functions import get_selection, app_version
-from core_functions import run_in_thread, get_ui_language
-from core_functions import set_key_for_command, insert_string
-from core_functions import disable_tracking, create_annotation, change_font_by_pattern
-from source.extension.src.pythonpath.core_constants import URL_WRITER_MODULE, TOOLBAR_BUTTONS_EXECUTIONS
-from source.extension.src.pythonpath.core_functions import get_ui_configuration_manager, ModuleConfigurationManager
+from core_constants import Key, URL_RESET_ATTRIBUTES, FORMATTING_RULES, \
+    ITEMS, UNDO_TITLE_DEFAULT_COLOR, DEFAULT_CHECKER_AUTHOR, CHECKER_ANNOTATIONS_LIMIT, CHECKER_REGISTRY_PROPERTY
+from core_functions import apply_settings_profile
+from core_functions import get_current_document, structify, set_all_texts_properties
+from core_functions import get_selection, app_version, iter_paragraphs
+from core_functions import run_as_job, get_job_document, is_job_cancelled, set_job_progress, \
+    get_ui_language, get_item_label
+from core_functions import set_keys_for_commands, insert_string
+from core_functions import disable_tracking, apply_formatting_rules
+from core_functions import insert_annotations, select_characters, remove_text_contents
+from core_functions import register_text_contents, pop_registered_text_contents
+from core_functions import ModuleConfigurationManager, UndoContext
 
 
 def dotted_underline():
@@ -27,38 +30,33 @@ def dotted_underline():
         selection.CharUnderline = 0 if selection.CharUnderline == 3 else 3
 
 
-@run_in_thread
+@run_as_job(BTN_SET_FONTS)
 @disable_tracking
 def set_fonts():
-    selection = get_selection()
-    if selection.getString():
-        selection.setPropertyValue("CharFontName", DEFAULT_FONT)
-        return
+    with UndoContext(get_item_label(BTN_SET_FONTS), get_job_document()) as doc:
+        selection = get_selection(doc)
+        if selection.getString():
+            selection.setPropertyValue("CharFontName", DEFAULT_FONT)
+            return
 
-    doc = get_current_document()
-    args = {"CharFontName.FamilyName": DEFAULT_FONT}
-    call_dispatch(doc, ".uno:SelectAll", ())
-    call_dispatch(doc, ".uno:CharFontName", structify(args))
-    doc.getCurrentController().getViewCursor().collapseToEnd()
+        set_all_texts_properties({"CharFontName": DEFAULT_FONT}, doc)
 
 
-@run_in_thread
+@run_as_job(BTN_COLOR_DIGITS)
 @disable_tracking
 def color_digits():
-    change_font_by_pattern(r"\d+", {"CharColor": COLOR_DECIMAL_RED})
+    with UndoContext(get_item_label(BTN_COLOR_DIGITS), get_job_document()) as doc:
+        apply_formatting_rules(FORMATTING_RULES, doc)
 
 
 def to_default_color():
-    selection = get_selection()
-    if selection.getString():
-        selection.setPropertyValue("CharColor", DEFAULT_COLOR)
-        return
+    with UndoContext(UNDO_TITLE_DEFAULT_COLOR) as doc:
+        selection = get_selection()
+        if selection.getString():
+            selection.setPropertyValue("CharColor", DEFAULT_COLOR)
+            return
 
-    doc = get_current_document()
-    args = {"Color": DEFAULT_COLOR}
-    call_dispatch(doc, ".uno:SelectAll", ())
-    call_dispatch(doc, ".uno:Color", structify(args))
-    doc.getCurrentController().getViewCursor().collapseToEnd()
+        set_all_texts_properties({"CharColor": DEFAULT_COLOR}, doc)
 
 
 def insert_accent():
@@ -66,104 +64,148 @@ def insert_accent():
 
 
 def switch_toolbar():
-    def bar_button(name: str) -> Tuple:
-        button = ItemData(name)
+    def bar_button(name: str, language: str) -> Tuple:
+        button = ITEMS[name]
         return structify({
-            'CommandURL': button.execute,
-            'Label': button.label_text(get_ui_language().upper()),
+            'CommandURL': button.command,
+            'Label': button.label_text(language),
             'Type': 0,
             'IsVisible': True
         })
 
-    menu_buttons_to_add = list(reversed([bar_button(NAME) for NAME in TOOLBAR_BUTTONS_NAMES]))
-    remove_menu_buttons() if is_menu_buttons_on_toolbar() else add_menu_buttons(menu_buttons_to_add)
+    with ModuleConfigurationManager() as manager:
+        positions = manager.find_commands(TOOLBAR_BUTTONS_COMMANDS)
+        if positions:
+            remove_menu_buttons(manager, positions)
+            return
+
+        language = get_ui_language().upper()
+        menu_buttons_to_add = list(reversed([bar_button(NAME, language) for NAME in TOOLBAR_BUTTONS_NAMES]))
+        add_menu_buttons(manager, menu_buttons_to_add)
 
 
+# NOTE: Not cancellable by a repeated click, it would leave neither the previous annotations nor new ones
+@run_as_job(BTN_CHECK_PAIRS, cancellable=False)
 def check_pairs():
-    delete_existing_comments()
-    mark_wrong_pairs()
+    if is_job_cancelled():
+        return
+    with UndoContext(get_item_label(BTN_CHECK_PAIRS), get_job_document()) as doc:
+        delete_existing_comments(doc)
+        mark_wrong_pairs(doc)
+
+
+def delete_existing_comments(xDocument=None) -> None:
+    xDocument = get_current_document() if xDocument is None else xDocument
+    annotations = pop_registered_text_contents(xDocument, CHECKER_REGISTRY_PROPERTY)
+    # NOTE: Missing annotations mean the registry is stale, e.g. an undo
+    # removed them and restored the ones of the previous run, so look for all of them
+    if annotations is None or remove_text_contents(xDocument, annotations):
+        remove_text_contents(xDocument, find_checker_annotations(xDocument))
 
 
-def delete_existing_comments() -> None:
-    xDocument = get_current_document()
+def find_checker_annotations(xDocument) -> List:
+    annotations = []
     oEnum = xDocument.getTextFields().createEnumeration()
 
     while oEnum.hasMoreElements():
         oField = oEnum.nextElement()
-        if not oField.supportsService(ANNOTATION_UNIT) or oField.Author != DEFAULT_CHECKER_AUTHOR:
-            continue
-
-        xTextRange = oField.getAnchor()
-        oCur = xDocument.getText().createTextCursorByRange(xTextRange)
-        oCur.Text.removeTextContent(oField)
-
-
-def mark_wrong_pairs(list_of_pairs: List[Tuple[str, str]] = CHECKER_PAIRS_TO_CHECK):
-
-    def check_quotes(pair_quotes: Tuple[str, str], quotes_list: List[str]) -> List[bool]:
-        """
-        :param pair_quotes: Пара проверяемых кавычек,
-            например, ("«", "»",)
-        :param quotes_list: Общий список кавычек в тексте,
-            например, ['„', '“', '„', '“', '„', '“', '“', '„']
-        :return: Список с результатами проверки, где True - кавычка на месте, False - ошибочная,
-            например, [True, True, True, True, True, True, False, False]
-
-        """
-        opening_quote = pair_quotes[0]
-        closing_quote = pair_quotes[1]
-        quotes_length = len(quotes_list)
-        result = list(quotes_list)
-
-        for i in range(quotes_length):
-
-            if result[i] != quotes_list[i]:
-                continue
-
-            if i == quotes_length - 1:
-                result[i] = False
-                continue
-
-            if quotes_list[i] == opening_quote and quotes_list[i + 1] == closing_quote:
-                result[i] = result[i + 1] = True
-                continue
-
-            result[i] = False
-        return result
-
-    def check_one_pair(pair: tuple) -> None:
-        xDocument = get_current_document()
-        xSearchDescr = xDocument.createSearchDescriptor()
-        xSearchDescr.SearchRegularExpression = True
-        pattern = rf"\{pair[0]}|\{pair[1]}" \
-            if pair[0] in CHECKER_ESCAPED_CHARACTERS \
-            else rf"{pair[0]}|{pair[1]}"
-        xSearchDescr.SearchString = pattern
-
-        xFounds = [x for x in xDocument.findAll(xSearchDescr)]
-        list_of_quotes = [x.String for x in xFounds]
-        checked_quotes = check_quotes(pair, list_of_quotes)
-
-        for xFound, okay in zip(xFounds, checked_quotes):
-            if okay:
-                continue
-            oCurs = xDocument.getText().createTextCursorByRange(xFound.getStart())
-            oCurs.goRight(1, True)
-            xFound.Text.insertTextContent(oCurs, create_annotation(f"Непарный знак '{xFound.String}'"), True)
-
-    for p in list_of_pairs:
-        check_one_pair(p)
+        if oField.supportsService(ANNOTATION_UNIT) and oField.Author == DEFAULT_CHECKER_AUTHOR:
+            annotations.append(oField)
+    return annotations
+
+
+def find_unpaired_symbols(text: str, list_of_pairs: List[Tuple[str, str]] = CHECKER_PAIRS_TO_CHECK) -> List[int]:
+    """
+    :param text: Проверяемый текст,
+        например, "«Текст (с вложенной скобкой)» и (лишняя»"
+    :param list_of_pairs: Список проверяемых пар символов,
+        например, [("«", "»",), ("(", ")",)]
+    :return: Отсортированный список позиций непарных символов в тексте,
+        например, [32, 39]
+
+    """
+    closing_to_opening = {closing: opening for opening, closing in list_of_pairs}
+    openings = set(closing_to_opening.values())
+    pattern = f"[{re.escape(''.join(openings | set(closing_to_opening)))}]"
+    stack, unpaired = [], []
+
+    for found in re.finditer(pattern, text):
+        symbol, offset = found.group(), found.start()
+        if symbol in closing_to_opening and stack and text[stack[-1]] == closing_to_opening[symbol]:
+            stack.pop()
+        elif symbol in openings:
+            stack.append(offset)
+        else:
+            unpaired.append(offset)
+    return sorted(unpaired + stack)
+
+
+def mark_wrong_pairs(
+        xDocument=None,
+        list_of_pairs: List[Tuple[str, str]] = CHECKER_PAIRS_TO_CHECK,
+        limit: int = CHECKER_ANNOTATIONS_LIMIT) -> None:
+    xDocument = get_current_document() if xDocument is None else xDocument
+    paragraph_count = xDocument.ParagraphCount
+    wrong_symbols = []
+
+    for chunk in iter_paragraphs(xDocument):
+        if is_job_cancelled():
+            return
+        wrong_symbols.extend(
+            (chunk.text_range, offset, chunk.text[offset])
+            for offset in find_unpaired_symbols(chunk.text, list_of_pairs))
+        set_job_progress(chunk.paragraph_index, paragraph_count)
+
+    annotations = [
+        (paragraph, offset, f"Непарный знак '{symbol}'")
+        for paragraph, offset, symbol in wrong_symbols[:limit]]
+    if len(wrong_symbols) > limit:
+        paragraph, offset, _ = wrong_symbols[limit]
+        annotations.append((paragraph, offset, f"Ещё непарных знаков: {len(wrong_symbols) - limit}"))
+
+    # NOTE: Go from the end so new annotations don't shift the offsets left to mark
+    inserted = insert_annotations(xDocument, (
+        (select_characters(paragraph, offset), content)
+        for paragraph, offset, content in reversed(annotations)), DEFAULT_CHECKER_AUTHOR)
+    register_text_contents(xDocument, CHECKER_REGISTRY_PROPERTY, inserted)
 
 
 def configure():
-    set_default_font(DEFAULT_FONT)
-    set_default_format(DEFAULT_FORMAT_WRITER_NODE_PATH, DEFAULT_FORMAT_WRITER_VALUE)
-    set_colors_of_changes_tracking()
+    apply_settings_profile(get_settings_profile())
     set_shortcut_keys()
-    disable_show_tip_of_the_day()
-    disable_collect_usage_information()
-    disable_crash_report()
-    disable_update_check()
+
+
+def get_settings_profile() -> Dict[str, Dict[str, Any]]:
+    misc_settings = {
+        "ShowTipOfTheDay": False,
+        "CrashReport": False,
+    }
+    # This option was disabled started from LO 7.3.0
+    # See https://bugs.documentfoundation.org/show_bug.cgi?id=140107
+    lo_version = app_version()
+    if (lo_version.major, lo_version.minor) < (7, 3):
+        misc_settings["CollectUsageInformation"] = False
+
+    return {
+        DEFAULT_FONT_NODE_PATH: {
+            "Standard": DEFAULT_FONT,
+            "Caption": DEFAULT_FONT,
+            "Heading": DEFAULT_FONT,
+            "Index": DEFAULT_FONT,
+            "List": DEFAULT_FONT,
+        },
+        DEFAULT_FORMAT_WRITER_NODE_PATH: {
+            "ooSetupFactoryDefaultFilter": DEFAULT_FORMAT_WRITER_VALUE,
+        },
+        REVISION_TEXT_DISPLAY_NODE_PATH: {
+            "Delete/Color": COLOR_REVISION_TEXT_DISPLAY_DELETE,
+            "Insert/Color": COLOR_REVISION_TEXT_DISPLAY_INSERT,
+        },
+        MISC_NODE_PATH: misc_settings,
+        JOBS_UPDATE_CHECK_NODE_PATH: {
+            "AutoCheckEnabled": False,
+        },
+    }
 
 
 def set_shortcut_keys():
@@ -181,81 +223,17 @@ def set_shortcut_keys():
 
     commands_list = [
         (ctrl_space, URL_RESET_ATTRIBUTES),
-        (alt_d, ItemData(BTN_DOTTED_UNDERLINE).execute),
-        (alt_a, ItemData(BTN_INSERT_ACCENT).execute), ]
-
-    _ = [set_key_for_command(*item) for item in commands_list]
-
-
-def set_default_font(font_name: str = DEFAULT_FONT) -> None:
-    with NCM(DEFAULT_FONT_NODE_PATH) as node:
-        node.Standard = font_name
-        node.Caption = font_name
-        node.Heading = font_name
-        node.Index = font_name
-        node.List = font_name
-
+        (alt_d, ITEMS[BTN_DOTTED_UNDERLINE].command),
+        (alt_a, ITEMS[BTN_INSERT_ACCENT].command), ]
 
-def set_default_format(node: str, value: str) -> None:
-    with NCM(node) as format_node:
-        format_node.ooSetupFactoryDefaultFilter = value
+    set_keys_for_commands(commands_list)
 
 
-def disable_show_tip_of_the_day() -> None:
-    with NCM(MISC_NODE_PATH) as node:
-        node.ShowTipOfTheDay = False
-
-
-def disable_collect_usage_information() -> None:
-    # This option was disabled started from LO 7.3.0
-    # See https://bugs.documentfoundation.org/show_bug.cgi?id=140107
-    lo_version = app_version()
-    if lo_version.major >= 7 and lo_version.minor >= 3:
-        return
-
-    with NCM(MISC_NODE_PATH) as node:
-        node.CollectUsageInformation = False
+def add_menu_buttons(manager: ModuleConfigurationManager, buttons_to_add: List[Tuple]):
+    for button_setting in buttons_to_add:
+        manager.insert_by_index(button_setting)
 
 
-def disable_crash_report() -> None:
-    with NCM(MISC_NODE_PATH) as node:
-        node.CrashReport = False
-
-
-def set_colors_of_changes_tracking() -> None:
-    with NCM(REVISION_TEXT_DISPLAY_NODE_PATH) as node:
-        node.Delete.Color = COLOR_REVISION_TEXT_DISPLAY_DELETE
-        node.Insert.Color = COLOR_REVISION_TEXT_DISPLAY_INSERT
-
-
-def disable_update_check() -> None:
-    with NCM(JOBS_UPDATE_CHECK_NODE_PATH) as node:
-        node.AutoCheckEnabled = False
-
-
-def is_menu_buttons_on_toolbar() -> bool:
-    standard_bar = "private:resource/toolbar/standardbar"
-    module_configuration_manager = get_ui_configuration_manager(URL_WRITER_MODULE)
-    toolbar_settings = module_configuration_manager.getSettings(standard_bar, True)
-    count = toolbar_settings.getCount()
-
-    for i in range(count):
-        for prop in toolbar_settings.getByIndex(i):
-            if prop.Name == "CommandURL" and prop.Value in TOOLBAR_BUTTONS_EXECUTIONS:
-                return True
-    return False
-
-
-def add_menu_buttons(buttons_to_add: List[Tuple]):
-    with ModuleConfigurationManager() as manager:
-        for button_setting in buttons_to_add:
-            manager.insert_by_index(button_setting)
-
-
-def remove_menu_buttons():
-    with ModuleConfigurationManager() as manager:
-        for i in reversed(range(manager.count)):
-            button_settings = manager.toolbar_settings.getByIndex(i)
-            for prop in button_settings:
-                if prop.Value in TOOLBAR_BUTTONS_EXECUTIONS:
-                    manager.remove_by_index(i)
+def remove_menu_buttons(manager: ModuleConfigurationManager, positions: List[int]):
+    for index in reversed(positions):
+        manager.remove_by_index(index)
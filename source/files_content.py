@@ -1,71 +1,196 @@
 from __future__ import annotations
-import datetime
-import uuid
+
+import os
+from typing import Dict, List
+from xml.etree import ElementTree
 
 from extension.src.pythonpath.core_constants import \
     BTN_SWITCH_TOOLBAR, BTN_DOTTED_UNDERLINE, BTN_CHECK_PAIRS, \
     BTN_SET_FONTS, BTN_COLOR_DIGITS, BTN_CONFIGURE, UI_ELEMENT_LABELS, \
-    BTN_INSERT_ACCENT, ITEM_NAMES, ItemData, FOLDER_ICONS, \
-    EXTENSION_ID, EXTENSION_VERSION, EXTENSION_NAME, EXTENSION_AUTHOR, EXTENSION_TITLE
-
-
-def temp_name() -> str:
-    return str(uuid.uuid4()).split("-")[0]
+    BTN_INSERT_ACCENT, ITEM_NAMES, ITEMS, FOLDER_ICONS, \
+    EXTENSION_ID, EXTENSION_VERSION, EXTENSION_NAME, EXTENSION_AUTHOR, EXTENSION_TITLE, BUILD_TIME, \
+    UI_LANGUAGE_LOCALES, URL_WRITER_MODULE, EXTENSION_PROTOCOL, PROTOCOL_HANDLER_NAME
 
 
-DIRECTORY_TEMP_FILES = temp_name()
 FOLDER_META_INF = "META-INF"
 DEFAULT_OUTPUT_EXTENSION = "oxt"
 DEFAULT_ICON_NAME = "icon_extension_logo"
+DIRECTORY_ICONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "icons")
 MENU_TITLE = EXTENSION_NAME
 
+NAMESPACE_OOR = "http://openoffice.org/2001/registry"
+NAMESPACE_XS = "http://www.w3.org/2001/XMLSchema"
+NAMESPACE_XML = "http://www.w3.org/XML/1998/namespace"
+OOR_NAME = f"{{{NAMESPACE_OOR}}}name"
+OOR_TYPE = f"{{{NAMESPACE_OOR}}}type"
+OOR_OP = f"{{{NAMESPACE_OOR}}}op"
+XML_LANG = f"{{{NAMESPACE_XML}}}lang"
+# Props of the Addons schema (officecfg/registry/schema/org/openoffice/Office/Addons.xcs) we write
+ADDONS_MENU_ITEM_PROPS = ("URL", "Title", "Target", "Context", )
+ADDONS_IMAGE_PROPS = ("ImageSmallURL", "ImageBigURL", )
+
+ElementTree.register_namespace("oor", NAMESPACE_OOR)
+ElementTree.register_namespace("xs", NAMESPACE_XS)
+
+icon_names = [
+    DEFAULT_ICON_NAME, BTN_COLOR_DIGITS, BTN_CONFIGURE, BTN_DOTTED_UNDERLINE,
+    BTN_SET_FONTS, BTN_INSERT_ACCENT, BTN_SWITCH_TOOLBAR, BTN_CHECK_PAIRS,
+]
+
 
 def generate_ui_translation_file(language: str) -> str:
     elements = UI_ELEMENT_LABELS.get(language)
-    ui_translation_file = "# coding: utf-8\n\n"
-    for element, label in elements.items():
-        ui_translation_file += f'{element} = "{label}"\n'
-    return ui_translation_file
+    lines = [f'{element} = "{label}"\n' for element, label in elements.items()]
+    return "".join(["# coding: utf-8\n\n", *lines])
+
+
+def generate_addons_file(item_names: List[str]) -> str:
+    """
+    Builds Addons.xcu as a tree, so labels are escaped and the file is well-formed by construction
+    param item_names: Names of the menu items in their menu order
+    :return: Validated content of Addons.xcu
+    """
+    root = ElementTree.Element(f"{{{NAMESPACE_OOR}}}component-data", {
+        OOR_NAME: "Addons", f"{{{NAMESPACE_OOR}}}package": "org.openoffice.Office",
+        # NOTE: Only prop types use the xs prefix, so ElementTree wouldn't declare it by itself
+        "xmlns:xs": NAMESPACE_XS})
+    addon_ui = add_node(root, "AddonUI")
+
+    menu = add_node(add_node(addon_ui, "OfficeMenuBar"), EXTENSION_ID, "replace")
+    add_prop(menu, "Title", [None, ("en-US", f"~{MENU_TITLE}")])
+    add_prop(menu, "Target", ["_self"])
+    add_prop(menu, "ImageIdentifier", [None])
+    submenu = add_node(menu, "Submenu")
+    images = add_node(addon_ui, "Images")
+
+    for number, name in enumerate(item_names, 1):
+        item = ITEMS[name]
+        submenu.append(ElementTree.Comment(f" {name} "))
+        menu_item = add_node(submenu, f"N{number:03d}", "replace")
+        add_prop(menu_item, "URL", [item.command])
+        add_prop(menu_item, "Title", [None, *(
+            (UI_LANGUAGE_LOCALES.get(language, language.lower()), item.label_text(language))
+            for language in UI_ELEMENT_LABELS)])
+        add_prop(menu_item, "Target", ["_self"])
+        add_prop(menu_item, "Context", [URL_WRITER_MODULE])
+
+        image = add_node(images, item.url, "replace")
+        add_prop(image, "URL", [item.command], prop_type=None)
+        user_defined_images = add_node(image, "UserDefinedImages")
+        for prop_name in ADDONS_IMAGE_PROPS:
+            add_prop(user_defined_images, prop_name, [f"%origin%/{FOLDER_ICONS}/{name}.png"])
+
+    validate_addons_tree(root, item_names)
+    indent_tree(root)
+    return ElementTree.tostring(root, encoding="unicode", xml_declaration=True) + "\n"
+
+
+def generate_protocol_handler_file() -> str:
+    """
+    :return: Content of ProtocolHandler.xcu routing every EXTENSION_PROTOCOL command to our handler
+    """
+    root = ElementTree.Element(f"{{{NAMESPACE_OOR}}}component-data", {
+        OOR_NAME: "ProtocolHandler", f"{{{NAMESPACE_OOR}}}package": "org.openoffice.Office"})
+    handler = add_node(add_node(root, "HandlerSet"), PROTOCOL_HANDLER_NAME, "replace")
+    add_prop(handler, "Protocols", [f"{EXTENSION_PROTOCOL}*"], prop_type="oor:string-list")
+    indent_tree(root)
+    return ElementTree.tostring(root, encoding="unicode", xml_declaration=True) + "\n"
+
+
+def indent_tree(element: ElementTree.Element, level: int = 0, space: str = "  ") -> None:
+    """Indents the tree in place like ElementTree.indent, which is missing before Python 3.9 bundled with the office"""
+    if not len(element):
+        return
+    child_indentation = "\n" + space * (level + 1)
+    if not element.text or not element.text.strip():
+        element.text = child_indentation
+    for child in element:
+        indent_tree(child, level + 1, space)
+        if not child.tail or not child.tail.strip():
+            child.tail = child_indentation
+    child.tail = "\n" + space * level
+
+
+def add_node(parent: ElementTree.Element, name: str, op: str = None) -> ElementTree.Element:
+    attributes = {OOR_NAME: name}
+    if op:
+        attributes[OOR_OP] = op
+    return ElementTree.SubElement(parent, "node", attributes)
+
+
+def add_prop(
+        parent: ElementTree.Element, name: str, values: list, prop_type: str = "xs:string") -> ElementTree.Element:
+    """
+    param values: Plain values, (locale, value) pairs for localized ones or None for an empty value
+    param prop_type: Type of the prop or None to leave it to the schema
+    """
+    attributes = {OOR_NAME: name}
+    if prop_type:
+        attributes[OOR_TYPE] = prop_type
+    prop = ElementTree.SubElement(parent, "prop", attributes)
+    for value in values:
+        locale, text = value if isinstance(value, tuple) else (None, value)
+        element = ElementTree.SubElement(prop, "value", {XML_LANG: locale} if locale else {})
+        element.text = text
+    return prop
+
+
+def validate_addons_tree(root: ElementTree.Element, item_names: List[str]) -> None:
+    """
+    Checks the parts of the Addons schema the office would otherwise reject or ignore silently
+    :raise ValueError: With every problem found
+    """
+    problems = []
+    for parent in root.iter():
+        names = [child.get(OOR_NAME) for child in parent if child.tag in ("node", "prop")]
+        if None in names:
+            problems.append(f"'{parent.get(OOR_NAME)}' has a child without oor:name")
+        duplicates = sorted({name for name in names if name and names.count(name) > 1})
+        if duplicates:
+            problems.append(f"'{parent.get(OOR_NAME)}' has duplicate children: {', '.join(duplicates)}")
+
+    submenu = root.find("node/node/node/node[@oor:name='Submenu']", {"oor": NAMESPACE_OOR})
+    for menu_item in [] if submenu is None else submenu.findall("node"):
+        props = {prop.get(OOR_NAME): prop for prop in menu_item.findall("prop")}
+        problems.extend(
+            f"Menu item '{menu_item.get(OOR_NAME)}' has no {prop_name}"
+            for prop_name in ADDONS_MENU_ITEM_PROPS if prop_name not in props)
+        if any(not value.text for value in props.get("Title", []) if value.get(XML_LANG)):
+            problems.append(f"Menu item '{menu_item.get(OOR_NAME)}' has an empty localized title")
+
+    image_urls = {value.text for value in root.iter("value") if value.text and value.text.startswith("%origin%/")}
+    known_urls = {f"%origin%/{FOLDER_ICONS}/{name}.png" for name in icon_names}
+    problems.extend(f"Unknown image '{url}'" for url in sorted(image_urls - known_urls))
+
+    if submenu is None or len(submenu.findall("node")) != len(item_names):
+        problems.append(f"Submenu must have {len(item_names)} items")
+    if problems:
+        raise ValueError("Invalid Addons.xcu:\n" + "\n".join(problems))
+
+
+def load_icons() -> Dict[str, bytes]:
+    """
+    Reads the PNG icons from the assets directory only when an archive is built
+    :return: Content of icons by their file names
+    """
+    icons = {}
+    for icon_name in icon_names:
+        with open(os.path.join(DIRECTORY_ICONS, f"{icon_name}.png"), "rb") as icon_file:
+            icons[f"{icon_name}.png"] = icon_file.read()
+    return icons
 
 
 files = {
     "manifest.xml": f"""<?xml version="1.0" encoding="UTF-8"?>
   <manifest:manifest xmlns:manifest="http://openoffice.org/2001/manifest">
   <manifest:file-entry manifest:media-type="application/vnd.sun.star.configuration-data" manifest:full-path="Addons.xcu"/>                     
+  <manifest:file-entry manifest:media-type="application/vnd.sun.star.configuration-data" manifest:full-path="ProtocolHandler.xcu"/>
   <manifest:file-entry manifest:media-type="application/vnd.sun.star.uno-component;type=Python" manifest:full-path="src/interface.py"/>
 </manifest:manifest>
 """,
-    "desc_en.txt": f"© {EXTENSION_AUTHOR}, {datetime.datetime.now().year}",
-    "Addons.xcu": f"""<?xml version="1.0" encoding="UTF-8"?>
-<oor:component-data xmlns:oor="http://openoffice.org/2001/registry"
-                   xmlns:xs="http://www.w3.org/2001/XMLSchema" oor:name="Addons"
-                   oor:package="org.openoffice.Office">
-    <node oor:name="AddonUI">
-        <node oor:name="OfficeMenuBar">
-            <node oor:name="{EXTENSION_ID}" oor:op="replace">
-                <prop oor:name="Title" oor:type="xs:string">
-                    <value/>
-                    <value xml:lang="en-US">~{MENU_TITLE}</value>
-                </prop>
-               <prop oor:name="Target" oor:type="xs:string">
-                   <value>_self</value>
-               </prop>
-               <prop oor:name="ImageIdentifier" oor:type="xs:string">
-                   <value/>
-               </prop>
-        <node oor:name="Submenu">
-          <!-- NOTE: Name "N001" will define our order in menu -->
-          {ItemData.generate_submenu_nodes(ITEM_NAMES)}
-        </node>
-      </node>
-    </node>
-
-    <node oor:name="Images">
-      f"{ItemData.generate_images_nodes(ITEM_NAMES)}"
-    </node>
-  </node>
-</oor:component-data>
-""",
+    "desc_en.txt": f"© {EXTENSION_AUTHOR}, {BUILD_TIME.year}",
+    "Addons.xcu": generate_addons_file(ITEM_NAMES),
+    "ProtocolHandler.xcu": generate_protocol_handler_file(),
     "description.xml": f"""<?xml version="1.0" encoding="UTF-8"?>
 <description xmlns="http://openoffice.org/extensions/description/2006"
 xmlns:d="http://openoffice.org/extensions/description/2006"
@@ -96,14 +221,3 @@ xmlns:xlink="http://www.w3.org/1999/xlink">
 
 </description>""",
 }
-
-icons = {
-    f"{DEFAULT_ICON_NAME}.png": b'iVBORw0KGgoAAAANSUhEUgAAADAAAAAwCAYAAABXAvmHAAABhGlDQ1BJQ0MgcHJvZmlsZQAAKJF9kT1Iw0AcxV9TpaKVgnYQcchQnSyIijhKFYtgobQVWnUwufQLmjQkKS6OgmvBwY/FqoOLs64OroIg+AHi6OSk6CIl/i8ptIjx4Lgf7+497t4BQqPCVLNrAlA1y0jFY2I2tyoGXtEHP0IYxIDETD2RXszAc3zdw8fXuyjP8j735+hX8iYDfCLxHNMNi3iDeGbT0jnvE4dZSVKIz4nHDbog8SPXZZffOBcdFnhm2Mik5onDxGKxg+UOZiVDJZ4mjiiqRvlC1mWF8xZntVJjrXvyFwbz2kqa6zRHEMcSEkhChIwayqjAQpRWjRQTKdqPefiHHX+SXDK5ymDkWEAVKiTHD/4Hv7s1C1OTblIwBnS/2PbHKBDYBZp12/4+tu3mCeB/Bq60tr/aAGY/Sa+3tcgRENoGLq7bmrwHXO4AQ0+6ZEiO5KcpFArA+xl9Uw4YvAV619zeWvs4fQAy1NXyDXBwCIwVKXvd4909nb39e6bV3w80RHKOUhakZQAAAAZiS0dEANgA1gDX0XWBEgAAAAlwSFlzAAAuIwAALiMBeKU/dgAAAAd0SU1FB+YLAw8WFRO12sEAAAAZdEVYdENvbW1lbnQAQ3JlYXRlZCB3aXRoIEdJTVBXgQ4XAAAVj0lEQVRo3r2aeZRd1XXmf/ucc+979V5NKpVKJalQaZ6FEQIxjxbYQEwc29hgstzETmO67YZ0wMQN7jhJd7zMiuMEGnewsWNobCDBExhjGwRtM1NIAqQqCSSVCg0llaqkKtXwpnvvObv/eAXd7pjOQNz3v3ffeu+eb59v7/2db1/hXV6vj5Zd/7NPdh88eHBD6/DAhvWtU2vaGlsWhspoRxh/qdgA+JbTSmmhbVjKowPEjb3JzCU9WVtXz5ETN+47tb0hezfPl3/Jj97YsVNsUu5s2/nE1YP73rjiay8MrT649WfFG997AictKNGgY4DFR56QgdMcgYSQBZxVFNDm95V8blZfMnPNQ2OrLvpuiAtDy1et1N84gP3PPrGoef8L1+eObr7GH3u25Qc7G/kvPzjIn3ywi/cvm6C5aQoUNLOoJmQBhAiRDFEARZwhKAQUK3l848bxavsp90wuPOOOBWdftPc3AmBX77ZCW/9zNzW9+b0bTOXJNnAcODqDm39co62Y4+YLG1jQdpjMeZLMYjNDTAIGPBZDIGQBMQYbGVQAMUgIqELQjDS/cXRq0YdvH19y1leWrz2x/K8GYOjJ760rDPXcVRy8cwOqeFKCb+DRbQ38ycMj/NePdnHRkgnifI2aT1G12CDEJmAcdcqoEnxAg2KtQcXUn66KiAExeA+qlnLnZ3rKXade13XRFa+8KwCv9/VJPNJ/1bw3vnG7m/xJu0qECRFoxuhUG3/+0yrHShlf/ECB7vbjqEZoVsOIB+tQk0NsBiSognoFD8aaOigEa93bIMQY0iTDiJLmNh4dO/HTN0zOWvzA8tWr3zE3zDt9MXh4yKa7tvxB+467v0X1mXYjMd7kwCgqEUMTDWx+c4rTFrQwq6mKGsUYwTqHcQ4xBjUQVPDBoOIwLsLlYsQ6wGAQNNTjKNaCEWxsCcYS155pn9n737/VtH/zH/TuH7LvtE73627u6O2TXz7+8+tX7Xvgy4Xm1+JgHViLkQgI+BCze8QzdDxl1bw8cX4S1IDxqAERhwZFQ4JzDiRGVRGpb7hmHkRABMECAVRRAbEO6wzqFUmezxd2Vr48WhZ29vb99co1/3Anfi2A/v7+q7b89MEvXbDuQGxMCq4eQcEgGkg1R/9UYN6siO4Og3WCYOqkCKACJrIQBDEyTRcQBIygRhEjEBSpLx9vFDEOMREhKDgBb8nV9sTDz/7oSyXXegS4/x+l0Pcfemjd1++66/a56db8jIYKYj0IBIlQUTCGim/gpb3HWHtCGzMaJhFT57Ma8ChBFUXBCF5DPdJiCdO8N85hXAzWEawhWIMaW/8sQlCwCpAiIWXy8Jb8N79+1+0Pf++hdf9PANte21Z45eWX73rmp4+1L58TE9kKWIMYC87VoymO42VL374Ky2YXyEc1RBSx9u1qIsYCpg6K+j1EwBhUpL5IFBNHmCjGRDE4B0ZAwWJALUErWFMlmBpv/M/H2jsmtt71Rt+2wjsCmOjtuenRb9y5YW5eWDq7gWCUYOM6bxUQIUjEVJpjogxzmgUX2XpcBVQN1kaIicA4jI0xNkKMRYxg3HSiOouxZjrRHWJjxEYgtt7s0gyfGTTLYaQBKzmKsWX21Pc3zBp+4aZfC2Dg+U2L0ld/dMPhqSprFsTMarKotXgVfAiEUC91qhFDI1NIUNqaLWrMW+UcsNM7ML0TIhhjQWS6cQkiUi+ZYuuldToHUMGIQUOAEBAqxDYjwTCZGaQpRk1M05FHbnjzxU2LfgXA6zt2intz8/VDIzvasixw2tI2GiOPCx4HuFwOEzlUBbKI0cmMjtaIlmZFXb26iLFgI9RYgtZ5HFRADCEoqvoWyjqdpmkiCsYHyAKhlhGyQKYKJiITS1BHuVxm1oxmGm2OiaHX2g73vXT96zt2ytsAsmq5c2Kw95r9xxIMsLK7gItq9QdpmH5wvWJkIXC8lNLa2kRjLsYR6v9iLSay0zQBYwzGmLcT2EzvyFt0zLxHNYD3EBTj69uh3hPFMeICzhjUFzg6YVk0K6ahQRhPCvzo8Z5rapVy59sAen6x6ep9u7e3HK04umYY5jZ5lASMRbCo9/VIiYBYql5oaWygmIswxqMCXsP0ohQxBrEG7z3B+3rJx7zdtEDeBoOCBiWghOCxUYRYg6pHVKlklj0jKUvaLHEuMKO9hdLQlpafPf741QCmUq64QwMDV/TsqVLVIou7GulszSPGvd1svH+rkoMYhxeHQbFMR00hyzKCKgEw1tZruRFUFVUheKbv1YWcMYbgQ703qJJlGeJcnaoGfLCocYwnGfsnE7ra8hibUWyscsrSmB19fVdUyxVnNm3a1H10+Njq48QkOGa1xhQKEZi4viDvMUhdiGlAjGCtwaB4nxG0zgIHOGsxtp60xtYpY62tM1EErEWnqRQyjwQQBc0CRgE/TVcFEQtxA4enYGhsinmdTYjxiMtYu6CV0tGR1U9t2tRtJg4PbuDwnqLPG6pZRlNDhM1Nd08xGGvf5nMIdRDWQOYDAcWrBQRrpJ6bwnTUdZrvbyX5W/0Bgg8YBMk8oVyFJMV4rSdz6tFairMQJMfAUEZTk6G9I8LGioktczscZt+zxQMHD24wO3f3b3hpZz+7R2oMHK1h6xWN4CwmjgiRQ209omi9vDU3e0bGq6Rq8E6xEhATYTDgA0maEILH6HTipykaQIJDfITxBlLFZAbJhIAjc5YgELxHjQONGZ6I6Dsace7KecyZqSRxXSs1Nmecc9Ic9uzZs8G058trzj13PnkzRt+uvdRqVeLgsQJiDRgDRhDAiIGQMbetyNDwFGNT9UXWEzGQkRGMYhBMJoh3BHUEUYQSUEElwduMNFLSAmTNAW0ClzNYiTF2BonO4shEJ49srvDDl/tZsWoGUZRggoEAOZewemE7pampNe7KDV0L3cIuajKbm+/upZJmZBohWkWyelMx4S0tr0hQZhfqwm1wVFnX7UCmxZkEELBG0DQBYwghqwu9LA+aQ5yCyTA2YEyEZE14dZSrhtEJy/4xy84heH7XfjZtH6c5DrxncQOSK5P5gMPjJGNmITC7vW2h+/nmAx3Lo37WrWinvSXi8KEqVRUi8Rg1dU2jnmklhhWhsxmWzbfsGg5UkiJ5N4HWapAoNheRquJyFjID1fox0qsHTUAtVgv4Uo6JMWX/ZMrApPDiruO88uY4OwZrFOa0cdopZ2AP9HLaqgpzO7ReDILgNUFTTyQ1jo+OdrjL1uwtRqGAmjK5XGCqlpEmYIOZbpr1rikEvFdMUIq2xJmr29k6MMFoqZO57VVCVkOrASse0wBBMrwHyeXAFVGNCTWYHFP2jTp2Dse82n+cl98cZteIZ87CBVx82eXcdP45rFq5gh19O3j6iae49JSltBYyQgiAoMZgjQXyvNrzUtFpEBqKeULwtDUXmJwcoVybjrih3oxSjwt1rofgiVyFE+fP4N7H9rBnqIPOdsFFObyBYD3WB6BITRuZqDUxeCjlwJHA3qPKy3vG2DpwjCNJYMW6Eznv6sv5wllns3b1GjrmdGKMZXR4nK99+34ueE8j5y3JE5kS3tr6oYkITctMTEHVK+75gaWlpcXnmpZ0OxbOLHJsNGU0sXQBkYBaRZwS0lB3E1yEWmFJu2Fmu6HvQMqpS5swcUBFSX0TU6Um3jycsutgxiv7j7Ht4ASvDE4yKY5E6prvrDNO59t3/w1d3ScQmTypzUhQqKR8+zv3sLfnKe78/Gm0dJRIXV2TSWrJbP1gNFZKOem000su39E9vHnLU02Lu3MsmhNTC8LQmOekeY4QEhAQZwkIOq3XocacZjjvpC42bR/m3BUryeVgz1CVbW9O0tN/mB0HE0rBcPr73se5l57KKdUKzz73HEeGj3Dxxov4/U99koVLl/9vGR4EE1Ke2fQMd/7FV7n5yhWsXw7W1YACIgG1ATEJqTcMHC4zc0nbsNv0av/AkuAXG/V0zmpk7dKZ9O0+zgXLmoijMhIUyRSbgfoAaqn5mGrVsnLOCfztpue47eeDjI6N8MrBKq61mTPWn82t117AaWedTufyJTS0dRBUKU9MkVSrzGhtIY7j6Q7tSQOYLGPXCy/yx7fcwuXntPOh82cTuSOIK2KMJZNKXYJUM0pTRbbvHSJuGx1wRA29BrtRBGY0Z2xc38kPN+3mdzbMYV6zUC0rSRIxVoLxUmB4IqH3cJXtA2/y6pE9jIaYv99+gN95/wX8ty9+lHXrTuaEBSdgiznUWpzGqBq8UVpbZ0Col9qAEjQgQbGZ4fVXt3Ljf7qFE/IjfOby1cxoHAGbIVEKWQkCSGaxU8qRkZhneg/xyYube93SJUt6/PYnESvk3Rhnrm3lr3+Y8jdPjNEoVUYmqwyXA3uGxjmURJR9IEs8mbGIDfy7T36CLa9up7mxlQs3ns/Mzk6COLyJ6yeukCEasNT9nzB9HgjTZ2VTTdny/C/5w899jtawl1s/tZ6F88axrgo2xvsaNgGrDqlV8ZOGHQNl4iLMW7S4x83r6uoZ3LOgFMKRouSge37g4jNm8+Av+jnvgvOZv6Kb1QsW8MlFi1i4cAmj4xM8/NhjHDh0mHM3nMRVV1/BL595met+9/dpLea48Y/+kNkLl2A0glCX30hAtB5xpk/L1iuVyUkef+xRbrn1P7N2TpWbPracpYurOFtGjK/bL1UPoQFfq+J8xvHJWTy9+yhnnndJaemC+T3uwo0b933n6R/0ZenwBpNXmpuUj5zdzZPPDfNvPnEN773sEmwhhxo7bZ0IG84+naQmFF2MtynnXXAen73h09x221c5MDjMjf/hs5x81tlIsbFuj+i01yIBUQjlhN29O/gf997HvffczZXndPOZ317M/K4xjJkAPMEbbBVEDV6rSJgiKefZfSTPL7cPcuO1F/XNPPW8fa6h0JDd/5e3PTSRHNgww4+BTLJhbSOf+MBCvvqXd7Js+UoWrFpFFhuQiMgr1sZYqdL7ymae/ekTPPHiM/Tv3klHDI///Em29rzKxz/2ITZefBGLVi6nMLOdWBzl0jgD/QM88vBPePCB+2mJSnzxdxdx+XnzmNVyBGsnUSJUDRIU7yJcSJGsQsgMR2ut/N0rg5y0eAarVq94qLu1mAnA9q1b5sS9f7VzQftrLVZy4GocGO7gC1/vZVKW82ef/wKrz1pP1phDgmdk4Aj3fv2b3HfPN7lw2ULOXjyfpS0FXPAcSgMv7O3nez3bODiZcWL3IuYtWoBElr3797P79deZ32z4wLldXHJWN2tWZRTjMkZriESgBiM1xNfIEkVSR5aWqZSa+PmLMbc9uJM/veEj48s+dvPKFetOPixvHert64/+VVf03Rsip2hUwZNn7+EObvvb13hxZ8x1//ZTXHrp+8FG3HrrH9N2bB8fPnU1K3MFGnyKyxJEHIhlMsrorVb5s8ee5ngIrOpoxpgaXTMi1i9r56TlrXTPCxQKE3ipYqbNM09dkruQEKoZUq6RUYCpBrYMNHL9t17mo6d38qGPfub27OQP/sflq1bq2+70juefWtQ1/I2XC3ZHm8nXwKR438yx0UYefmqUu360i+PHLS0LFvOegvJHp6+j01SIsoCXiJoxWJRI6/b6VK6BO7btoRqNcMuHF+HcGPmCJS54TK5GsDXEgEtzqElQm5ISsCHCVSFMCZpUCdrI64Md/Ol3tjOjNeJzHzp9NDr7s6cuOnPj3l/xhVadeeHeUstFt2smkFpQh0pCe8s4v/fbDTz4F2dw86fXcmz/Di5Zu4RWpwSvhJDDZRH5LGAyEFLiLGEsWLYfGubElXna5x5hRtc4uY4xssYRsvw4JpdhBdSVETyECJPlIXH4CqivkaYF+gaa+cL9fVRqNW44p53WlZfc/tbi/4EzN9lx6leq+d/q8SGg3pChqDjITbG4c5wPnthI9wxDkllCUrdrE4FEAoQM0YwJKbLFRty+eSsuHmbjulaIq+AUGxwNoZE4jTGZTDt9SsCgqcEkIEmGZBmVqQIv9Tfzxb/fhS+X+NwlXXS95/Ke8YVnfOUdrcVlq08sTzavvy7omqNS8/Wo4vFZDg0prbOqXHHpMm77yc949Mgx+lPHqFVK1jNoha1pwn2vD/KZ7z7GWHmQW69cybyOcYIL4GM0eEKoACnBe3zq8Qlo1SCpICHDl+HwoQ4eeSHi83e/Qs54Pn9ZF+uXLz9am3vydcvW/Oro6ddOaA6++OOPzzx297ec2ZHX4LDiUEnxPmJqopW/+0WZex55FV8tcsKsdhpjw9DEJLuGj3PSirl85MwOzl3vmDu7gqVCoG43WwSCJ/gMxCNGQSMk5NAkz9GxHC/uqPKjZ0Z4vvcQV507m4+vb+SErpXVsTXXfmru+Zff/0+aD5SaFz1gwxWzm0fv+3JD2BsjKZgAxtHcMsrvXdbMB8/fwO4R4cdPlvn+T7ezan47AF2zZtLZVCQvNXwawFiMBAg1QhAkCOojghYIwVKrFjlyTHhjoMLPth7g8c2HOGdtK3dcu5ST5yY0F+Yl44uvuGVy1uIH/lkzstf6h2zHwU3Xzzj+8JeMbM2L9SiKNzGRdaj3HDw4hy98bTdr5hh+a00Lb4zUeGzLCD27Jlm5tJUz1jQzt8PRXszTGjdApNQ0Y7zkOTbmGRwpsf1gmW17R6lMBM5Z1s4lJ7Zw1gpHa8MEkntPdWrJlbccWv2+O07q7vT/7CHfG3194sYHrmo7fN/tLbqjHZcSbERwZZKklXsfSXnyqd186aOdLJ4/gfeOkbEib47k2bxrktcGE/ZPpIxMTFKrZQiCBiXnhOammNkzG1nSErF8TsSizhZOaAzMLRwlaiqRFs47Orry0zeU/pEh3z9pzLrzqR+ui0e33dVYenxDS6FEcMq+o438+y9v5co1M7nmzIAtTiGxQ8tlQhJRS5qYqDYwUQmkWcATU6lkIIZ8DhqLijOeltjS0JRiY48kHpPUKM29tqc079Tr5r73XY5Zf2Xwt31bYduLz9008spjN7Smg237RxO+/2gv37h2EWtWHCUSRcViEoVaRogDIWcwPsJoRLDgvWIxiCpGMzStESRDQoyRCmV3/ujE4o/cPrngrK8s+9ccdP+f16bHn1j0wgsvXD+0bfM1y0o9LVedJcxqGSU1+bqnmaWoD/WhZTTt/0+PXAEkKJoFNK17okQ5QuP547WZp9wz0XX6HV1n/IZeNfiVAfiOnZJUyp2F3k1Xz6v2XeHC8OrMP110Bkww+DQDa7BR3ZpHmTZ1QXwNn3h8fHFJcrP6kvbVDw0vuei7Pvr/9LLH/329MFxxC954sjsqHdyQm9izwSZTa3zUttCG0Y5o6uWiqFLNn1oKuZnDLh0dCLaxt1xc3FNt7uo5tHrjvtNnvbvXbf4XxlekmkYHqKgAAAAASUVORK5CYII=',
-    f"{BTN_COLOR_DIGITS}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAADdcAAA3XAUIom3gAAAL1SURBVEhLrZXPaxNBFMdnZnfzs0nUFn/gX6CCiFhaTH95UtCK3gQpWEH0qBeFXoRe/UHBg4IHhYKggsQeFCvYgy0F8aIHESqilLYYaDWNadLNzjy/u5mmoWmywfQDs/Pe25n57rx5k3AGuu++3uMo4wnBRMBwY7Wguai2KiDA2HvJaPDjSPd3HfUQ7qMojUvo+vwWrwn36DE5v6EjZTwBLJzwvCaRTvFAS6BlXzwe36FDJYGtwv6bTkomvzircjwaje50Y1sqEGxp+4DuLJE6SA71uzFPQDGWdk/KtZtBmMHpvJ1PwXRIUsSLlR70CMuPE6N5prjNJE5FcgXFNEmW0z7hS5YwfGFjw7h5RmxCOeZt+GE0TEBEGx69NyfMlShrE2lzjDPejg0tqqBzyigaF4jEZfg2C8gBsWxO6illDEvSTOpKILPwox/LnkGoR1iB47lcZqIssEbHtclJCCRR2WkyzE5Dyv3Y2TOU4jcu2OnpO8mf7rhEIrG9UCgcEcLsQjpOckaHMEYi/59QsqP51fwDDCv6HvL0yNFXwUSxdTmeaMfiC6FQ9FzYCr+x8/asIDHGpDrPBJ8lQRcNS+wt2IUkFr+HqUV3ftUOOq9OvUP0GFL4iwvesfbFgIcCoSHsbgg7msHJvTCsQEoIOZfNZn/jPWqlmqod4CgfIj1LpNionQ3O67CLxYn3oZ/CV3YU7JXhXO7PZyy+iNimi7tU7WAjEStyWHF1QjBhQXiAOOUQfo7mKKZStm1/9Qb+L8j3rXAgTJs1pOy6HlaTRm5yvQtYMzVr+AqQQS/RFUreOjjotDDFW+02R9AKDiIlqiI9TigU6tWv69JIilDmIo6usiAMoURM23VpSADV063NMsSZW7K+NCKAu8W6tF2GmHcnfPEViEQiu6GwTbvrKLkrFou1aq8mvgLWiuVWkCx560C0mM1a3u9NPXwFMizzB91TtMr7ILllPGZsKav95oixWCtu7X2UZw79cjgYHkbY+8eqD2P/AFyfJ1u/I+b/AAAAAElFTkSuQmCC',
-    f"{BTN_CONFIGURE}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAQAAABKfvVzAAABM0lEQVR42rWUvUoDQRDHf5VygTslnp2C2JzWeQHtjFWIZ97BQp9B8Dl8ADsLMWqjRTobCQh+FEIuhVUgpkpxGYvbW3dyCZyCM83y/2B3ZpiFYuyTIAgJdUpFJheEXjmDOFkiKsqwMFt0SJcrdgA4U4ZjAGq0eeYgl0eMDd3lTcmFCQ/ckiIIY6LM0J4Szc82QMiktEHYgApfU2BCjI9Ps/DAEcsADQZKXrXNqNJ3mA/TFiB06ohV/1oWv8RzicgSvjIsWXxTT2LLEsEcw7YLh9xYoqkMscU7hD9zdot+ZcUp+t1hBjQAVu2c8+zTIiAgVnJBGOLB2q8GFwJclJZ3speuM0IQUq65L9z3wpM5pdTy4na549w07kTJT83SPvLJ0ezdWFQG7x9W9A+fQJ2eke8VyW8XRyaZm3NOsgAAAABJRU5ErkJggg==',
-    f"{BTN_DOTTED_UNDERLINE}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAALiMAAC4jAXilP3YAAABnSURBVEhLY5R3t2NABw93HvoPZTIA5RmhTJwAn3omKE0zMGoBQTBqAUFAcwsIZjRSAVEZjZjcSyzAGUTUsgRrEJEKRssiisCoBQQBzS2gSj7AB2juA1DOA1GgnAjGID41xWjsAwYGANcTKLoAeDV3AAAAAElFTkSuQmCC',
-    f"{BTN_SET_FONTS}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAADsQAAA7EAZUrDhsAAAQjSURBVEhLjVVbbBRVGP7O7L0t21a2tqWEQgSDFzCiVW6xYsGgRAkhVBP1xRCf9EEJkoCxWaMoaY1oSAyg8cGID0RNIMREC7IYMaBNTIxWoFub1mKV1g1lp7vb3Znjd2YPs0u32/I1nTn/Zf77+VdgFrR2SC8CE+d4XKFoI/GveimciLQs3Hy0XVianhaGfpeFDEzcy+cyTbqQkKsSPw/crsmymNWBkLKNT58mXQiJ2hzEak2WhetAlaL1HXO+Jh2QV0NT7Zq8EYKw7e3rd8WrNcfBuh39zZDSLX3+QMZDb6feFZAvS4lRMs8xxD6ynxICDY6ORlEPHEhgiN98Sb1l/J59EgwKr3zXuXC/ytNx0Pqmeb805EkBEVb0VNQGgeQkkLXzDoIsmNcQSGZofhqQO+w1/Ku79zUNelRppDd7mAnfpeUuAh5g853AnseAMM89lxlT2sT2Nj+2rvUjnQIuJ2zYU/ww6rCUuXBL0/4Thgyl19HnBi1zoYy/tAZ48REgMgeYX6sFRH2tgboaA89vDGDbSj/boQXFkKJ9bFH/fYawZQMVSlQ2LQUev4clmWHOlOzRFh9WNDOaKWDx/TY8dcbDmdBnzPBDzrV7YSIh4JmVMxu/DqWzZY3f6UsBMsvHG6dDn3xtRKPCDviu7SLjuCMjmliOajq5WdTfIlAVKiqCxOG6CrML0ajtxPjtzkbTlvYeSpx2zQlwSqZkXV0BBMmrYKSVxcaIgE8wgwLP46nZfTR6N+eOGTocwoOAe55u+JY3Awe2Aq8/HULD3NLa5UNTkDItrrkKzqFt79W5nPJDHDAnjHGOXzanTgUoweJGYF5dqfE070M6e92DED5Lfrxhxy+VijJ4D4I5+GgcbGsegwlgNKmJm8DQFRvJVCFvDsyTOaN637YO6TcQNJ+FtLeo3aLluJoBPv0RsHhzZ4PF2fvq7CQyRRnTELslXxgzBzYZlm1f4syW7PTuOPDFTzM7UcaP0fhvw6VK3GMTFnx/egZP7h1sPpNdwgSWa5kDixn3DAN9XA+rFvPKsPQqyfFMloYtJJjmgeM5fH/BKmqwC8k9916sa8ERg19JIbxvkXklLytA7ZgfhrhvxtP4x0xhJJlC/GIf+i/F8cfFYSfyaYwrXp+Rke8zJOmMRGx34IKEcVALR/j/ORv1mpTyL4fHP4vecraNycwkchwxypRIyeIsMXVxjJwxxRPC6Dr1wW3OXncb6/z2VpqR2KtVI5qFBzpGw0F/8JuPnpt4MKRXQe+vvzvvMdOHQ2cbT9sVlU/EovXuzK3f2Tuvu3Pp3yp6RbtDHYuKXLFxhfPRyDj1jjgplILzIQ4WG1fo7rxDLXVXv/TWTAFVT3FtqOV1A4Je+z+vzzivybKY1cGtS6p6OUE9mnQR9MszawMLBjRZBsD/VTKT1KVjgdAAAAAASUVORK5CYII=',
-    f"{BTN_INSERT_ACCENT}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAABhmlDQ1BJQ0MgcHJvZmlsZQAAKM+VkT1Iw1AUhU9TRSkVBzuIOmSoThakigguEsUiWChthVYdTF76B00akhQXR8G14ODPYtXBxVlXB1dBEPwBcXRyUnSREu9LCi1CBS883sd57xzuuw8Q6mWmWV0TgKbbZjImiZnsqtjzigCG4UMUszKzjHhqMY2O9XVPN6nuIjwL/6s+NWcxwCcSzzHDtIk3iKc3bYPzPnGIFWWV+Jx43KQGiR+5rnj8xrngssAzQ2Y6OU8cIhYLbay0MSuaGvEUcVjVdMoXMh6rnLc4a+Uqa/bJXxjM6SsprtMaQQxLiCMBEQqqKKEMGxHadVIsJOlc6uAfcv0JcinkKoGRYwEVaJBdP/gf/J6tlZ+MeklBCeh+cZyPUaBnF2jUHOf72HEaJ4D/GbjSW/5KHZj5JL3W0sJHQP82cHHd0pQ94HIHGHwyZFN2JT8tIZ8H3s/om7LAwC0QWPPm1jzH6QOQplkt3wAHh8BYgbLXO7y7t31uf95x5wfpB/5fct+mrTaGAAAACXBIWXMAAA7BAAAOwQG4kWvtAAAAB3RJTUUH5gobATQys15SQAAAABJ0RVh0U29mdHdhcmUAR3JlZW5zaG90XlUIBQAAAM5JREFUSEtjGAVUB/+PF/+XB1IgZtCq/yCaeuD/72v/q9UghjNoVf8/95PKFtzrMwcbzmzS8v/ab2q7/vWc/45Ait9zzv971DYcBO716f8XDV36/zktDKcL+P/72P9ieWDkikb9X/uZBr74f736vzqQYmBg/h+1iQoWXGvT/8/MIPo/at0PsGHYfPBzXdR/UaCUaOZe0iz8/x8pvYeuxal5aywzRI1aNVAHib5C9wE2QLYPRgFRgKZxMCCpiKr5ABugek5GBzQviwYpYGAAACrQwIYqJkYSAAAAAElFTkSuQmCC',
-    f"{BTN_SWITCH_TOOLBAR}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAACxMAAAsTAQCanBgAAANdSURBVEhL1VRJT1NRFOZ2ptCWltLSkoBlKhbC1IKUkBChERYVF4bEsIGNjS7cuHDDAhMT/4ArdcGWUBeiC4c4IDGlMdDEaIpYNMEYgTbKEEpoX5v6ndcnKU0NqBjjSV7eu+fe+31n+M7L++9NLLx583g8UovFIg8Gg0nBdXRG4BqN5jqeqYGBARVcLL1zROZ2u5UAvy8SieKFhYXP7Xa7Hu5cJL9NzChygD9jjMULCgpmm5qaylKp1B4gslQODQ1pKVssRXh+mYxR5AD3IZNdvOdbW1tNY2NjIvg1IH8sFos/yeXyVzU1NaP19fVV3d3dEuHuoY1R5Gq12keZKJXK2cHBQU1HR4cOhAH4SAApBMDJZLJVo9F4Ffv7xJJpOTcAro5Go2fi8fixRCJRtry83KnVau+MjIzcNJvN4yCZ2dnZkWH/+Pb2tmtlZcVWXV39JBwO7woQPzXW0NBgRNRvEWEMpZjNz89/CUCOykaZUbnoHEXtdDo7JRJJSOjZtM1m06Vhchvr7++X63S6e3QBwNM9PT3GkpKSW1gnBJB5lGqv8UTW1dVVKZVKFykgvV7vJQweLdvoMOp5BUBJXPjY3t5ugZsBdAnrb6haEHscsvNRTzJJkLUDzf+KZbK0tPSikOU+Yy6XSyM0MY5pHsUhXh3whUAQrqurswPcTyQk5cw5mZycFJtMpnGaoaKioqc5lUWs5eXl54kA6viMejZTnQ0Gww0CxRA+tFqtJwG+SGsQ+1paWsx0r7GxsRa9iNBdYJzNnJ19RlEXFxffpkjQ4PdoajPVHBm8Ix/KEMWblJIkMMqY5gS9KkPPZpDFtWzJZjMxAGoXFhbubm1tOQH8BfK7BLLXkUjk8sbGRh9IOPRjYn193Q0pO1C2ud7e3lPIJkY/Sa/Xe+CPkkF+BvovUZR4YsjKC/2fg2JOtLW1OaEWj0qlmsNZUlfigH9XTmPDw8OKioqKC+jHEsrCAYgvCx7+G76YQqEIofbUEyoXPyd0Nw2RtoMYGdSjQ6n61tbWTm9ublbCl8KsLGI+plC6FyiRyu/3P+A4rgp9eAMhuAOBwCqd4xEOY6QUUgY1kL5/rIVt5nA4rMj0A/oTA/lEdqP/2IgM/anFDDyiYaUAhK0jNUYD9rfA/5Xl5X0HEO4mtVMUk+QAAAAASUVORK5CYII=',
-    f"{BTN_CHECK_PAIRS}.png": b'iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAACxMAAAsTAQCanBgAAAF1SURBVEhL3dZNKwVRHMfxQXncKAskDztkY63IhpINC0/vwEJJ8Q68ARZKKYkVdrKTusVaFjay0n0BHhZE4vubmXub+7/nzNyUyK8+d87858zMueeemW7w06mKt74soDdqluQCZ5hHnwomz9jBY7jnyTg+PXThEVOzNhFU68OT9njrikbYGjW9adNH2hQ1oyNqluUeOrcz3HNH05NPu8EAZqJmWQ6hc33HlRscRU13ZuGaW9GF50zN0iBSf4OsZK3AMH/6BhWd+7+nqC7e2pwjh4Zw75vREn1Actl9YB010KviCcnjVrhMbeqxBdtZT+UYdHw7rmXZRUm6cQXb8R3D6MF1XKvEGoppxC1cHTXiJtwlalle0YViFuHqKENYMrUsKyjJHlwdRW/VA1PzecMyiiks05d460ot9JWzkscoNsI9kwm4RiRTmDQ16wQtSI1reWrkhXe+67imZBUVPdXKNI5xCa2efiSjPwGn0HLexyB+M0HwBbTztQD+GrWZAAAAAElFTkSuQmCC',
-}
@@ -1,122 +1,310 @@
 # -*- coding: utf-8 -*-
-import base64
+import argparse
+import hashlib
+import importlib
+import json
 import os
 import pathlib
-import shutil
-from zipfile import ZipFile, ZIP_DEFLATED
+import sys
+import types
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
 
 import files_content
 from config import log
-from files_content import DIRECTORY_TEMP_FILES, FOLDER_META_INF, FOLDER_ICONS, \
-    DEFAULT_OUTPUT_EXTENSION, EXTENSION_VERSION
+from files_content import FOLDER_META_INF, FOLDER_ICONS, DEFAULT_OUTPUT_EXTENSION, DIRECTORY_ICONS
 
-from extension.src.pythonpath.core_constants import EXTENSION_NAME
+from extension.src.pythonpath import core_constants
+from extension.src.pythonpath.core_constants import EXTENSION_NAME, BUILD_TIME_VARIABLE
 
+DIRECTORY_PROJECT_SOURCE = str(pathlib.Path(__file__).parent.absolute())
+DIRECTORY_EXTENSION = os.path.join(DIRECTORY_PROJECT_SOURCE, "extension")
+DIRECTORY_PROJECT = pathlib.Path(DIRECTORY_PROJECT_SOURCE).parent.absolute()
+DIRECTORY_PROJECT_BUILDS = os.path.join(DIRECTORY_PROJECT, "builds")
+BUILD_MANIFEST_PATH = os.path.join(DIRECTORY_PROJECT_BUILDS, f"{EXTENSION_NAME}.manifest.json")
+# Generator files the archive content depends on besides the extension sources
+GENERATOR_INPUTS = ("files_content.py", "oxt_generator.py", )
+VARIANT_MODULE = "core_variant"
+# Zip entries store local time without a zone and can't be older than 1980
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+ZIP_SYSTEM_UNIX = 3
+ZIP_FILE_ATTRIBUTES = 0o100644 << 16
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Critical chunks plus the transparency the icons can't do without
+PNG_KEPT_CHUNKS = (b"IHDR", b"PLTE", b"tRNS", b"IEND", )
 
-def create_temp_structure(output_directory_path: str = DIRECTORY_TEMP_FILES) -> None:
+
+def generate_extension(optimize_icons: bool = False) -> None:
     """
-    param output_directory_path:
     :return:
     """
-    os.makedirs(output_directory_path, exist_ok=True)
-    os.makedirs(os.path.join(output_directory_path, FOLDER_META_INF), exist_ok=True)
-    os.makedirs(os.path.join(output_directory_path, FOLDER_ICONS), exist_ok=True)
-    log.info("Create the Temporary directory '%s'", output_directory_path)
+
+    log.info("Generate extension")
+    write_oxt(generate_entries(prepare_icons(optimize_icons)), collect_source_files())
+    log.info("Complete creating extension")
 
 
-def generate_extension() -> None:
+def generate_extension_incremental(optimize_icons: bool = False) -> None:
     """
+    Rebuilds the extension only if its inputs changed since the previous build.
     :return:
     """
 
-    log.info("Generate extension")
-    create_temp_structure()
-    copy_extension_folders()
-    create_icon_files()
-    create_basic_files()
-    create_oxt()
-    remove_temp_structure()
+    inputs = hash_inputs()
+    if optimize_icons:
+        inputs["optimize_icons"] = "yes"
+    manifest = read_build_manifest()
+    previous_inputs = manifest.get("inputs", {})
+    previous_output = manifest.get("output")
+
+    if inputs == previous_inputs and previous_output \
+            and os.path.exists(os.path.join(DIRECTORY_PROJECT_BUILDS, previous_output)):
+        log.info("Inputs are unchanged, keep '%s'", previous_output)
+        return
+
+    changed_inputs = sorted(
+        name for name in set(inputs) | set(previous_inputs)
+        if inputs.get(name) != previous_inputs.get(name))
+    log.info("Changed inputs: %s", ", ".join(changed_inputs))
+    output_name = write_oxt(generate_entries(prepare_icons(optimize_icons)), collect_source_files())
+    write_build_manifest(inputs, output_name)
     log.info("Complete creating extension")
 
 
-def create_basic_files(
-        output_directory_path: str = DIRECTORY_TEMP_FILES) -> None:
+def hash_inputs() -> Dict[str, str]:
     """
-    param output_directory_path:
-    :return:
+    :return: SHA-256 of every input file by its path relative to the source directory
     """
-    for file_name, file_content in files_content.files.items():
-        if file_name == "manifest.xml":
-            file_name = os.path.join(output_directory_path, FOLDER_META_INF, file_name)
-        else:
-            file_name = os.path.join(output_directory_path, file_name)
+    paths = [os.path.join(DIRECTORY_PROJECT_SOURCE, name) for name in GENERATOR_INPUTS]
+    for directory in (DIRECTORY_EXTENSION, DIRECTORY_ICONS):
+        for root, _, _files in os.walk(directory):
+            if root.endswith("__pycache__"):
+                continue
+            paths.extend(os.path.join(root, filename) for filename in _files)
+
+    hashes = {}
+    if os.environ.get(BUILD_TIME_VARIABLE):
+        hashes[BUILD_TIME_VARIABLE] = os.environ[BUILD_TIME_VARIABLE]
+    for path in sorted(paths):
+        with open(path, "rb") as file:
+            name = os.path.relpath(path, DIRECTORY_PROJECT_SOURCE).replace(os.sep, "/")
+            hashes[name] = hashlib.sha256(file.read()).hexdigest()
+    return hashes
+
 
-        with open(file_name, 'w+', encoding="utf-8") as file:
-            file.write(file_content)
-        log.info("Create basic file '%s'", file_name)
+def read_build_manifest() -> dict:
+    try:
+        with open(BUILD_MANIFEST_PATH, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
 
 
-def generate_base64_from_file(path: str):
-    with open(path, "rb") as encoding_file:
-        return base64.b64encode(encoding_file.read())
+def write_build_manifest(inputs: Dict[str, str], output_name: str) -> None:
+    with open(BUILD_MANIFEST_PATH, "w", encoding="utf-8") as file:
+        json.dump({"output": output_name, "inputs": inputs}, file, indent=2, sort_keys=True)
+    log.info("Write build manifest '%s'", BUILD_MANIFEST_PATH)
 
 
-def create_icon_files(output_directory_path: str = DIRECTORY_TEMP_FILES) -> None:
+def set_build_time(epoch: int) -> None:
     """
-    param output_directory_path:
-    :return:
+    Fixes the build time used for the version, the copyright year and the archive entries.
+    Worker processes of the matrix build inherit it through the environment.
+    param epoch: Unix time in seconds
     """
+    os.environ[BUILD_TIME_VARIABLE] = str(epoch)
+    importlib.reload(core_constants)
+    importlib.reload(files_content)
+
 
-    for icon_name, icon_file in files_content.icons.items():
-        icon_path = os.path.join(output_directory_path, FOLDER_ICONS, icon_name)
-        with open(icon_path, "wb") as icon:
-            icon.write(base64.decodebytes(icon_file))
-            log.info("Create icon file '%s'", icon_path)
+def generate_variants(matrix_path: str, processes: int = None, optimize_icons: bool = False) -> List[str]:
+    """
+    param matrix_path: JSON list of variants like {"name": "en", "overrides": {"DEFAULT_FONT": "Calibri"}}
+    param processes: Number of worker processes, all CPUs by default
+    param optimize_icons: Recompress the icons once for all variants
+    :return: File names of the created archives in the order of the matrix
+    """
+    with open(matrix_path, encoding="utf-8") as file:
+        variants = json.load(file)
 
+    log.info("Generate %d extension variants", len(variants))
+    icons = prepare_icons(optimize_icons)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                generate_variant, variant["name"],
+                dict(variant.get("overrides", {}), EXTENSION_VERSION=files_content.EXTENSION_VERSION), icons)
+            for variant in variants]
+        output_names = [future.result() for future in futures]
 
-def copy_extension_folders(temp_directory_path: str = DIRECTORY_TEMP_FILES) -> None:
+    log.info("Complete creating extension variants")
+    return output_names
+
+
+def generate_variant(name: str, overrides: dict, icons: Dict[str, bytes]) -> str:
     """
-    param temp_directory_path:
-    :return:
+    Runs in a worker process: regenerates the content with the variant overrides
+    and ships them in pythonpath/core_variant.py for core_constants to pick up.
+    param name: Variant name used as the archive name suffix
+    param overrides: Values of core_constants to replace
+    param icons: Icons shared by all variants
+    :return: File name of the created archive
     """
-    shutil.copytree(DIRECTORY_EXTENSION, temp_directory_path, dirs_exist_ok=True)
+    variant_module = types.ModuleType(VARIANT_MODULE)
+    variant_module.VARIANT_OVERRIDES = overrides
+    sys.modules[VARIANT_MODULE] = variant_module
+    importlib.reload(core_constants)
+    importlib.reload(files_content)
 
+    entries = generate_entries(icons, overrides)
+    extension_name = f"{EXTENSION_NAME}-{name}_{files_content.EXTENSION_VERSION}.{DEFAULT_OUTPUT_EXTENSION}"
+    return write_oxt(entries, collect_source_files(), extension_name)
 
-def create_oxt():
 
-    os.makedirs(DIRECTORY_PROJECT_BUILDS, exist_ok=True)
-    extension_name = f"{EXTENSION_NAME}_{EXTENSION_VERSION}.{DEFAULT_OUTPUT_EXTENSION}"
-    output_extension_path = os.path.join(DIRECTORY_PROJECT_BUILDS, extension_name)
+def prepare_icons(optimize: bool = False) -> Dict[str, bytes]:
+    icons = files_content.load_icons()
+    if optimize:
+        icons = {icon_name: optimize_png(content) for icon_name, content in icons.items()}
+        log.info("Optimize icons to %d bytes", sum(len(content) for content in icons.values()))
+    return icons
 
-    file_paths = []
-    for root, _, _files in os.walk(DIRECTORY_TEMP_FILES):
-        for filename in _files:
-            if root.endswith("__pycache__"):
-                continue
-            filepath = os.path.join(root, filename)
-            file_paths.append(filepath)
 
-    with ZipFile(output_extension_path, 'w', ZIP_DEFLATED) as oxt:
-        for file in file_paths:
-            oxt.write(file, file.replace(DIRECTORY_TEMP_FILES, ''))
-            log.info("Packing file: %s", os.path.basename(file))
+def optimize_png(content: bytes) -> bytes:
+    """
+    Drops ancillary chunks (profiles, dates, comments) and recompresses
+    the image data with the best zlib level. The pixels stay the same.
+    param content: PNG file content
+    :return: Optimized PNG file content or the original one if it is not smaller
+    """
+    if not content.startswith(PNG_SIGNATURE):
+        return content
+
+    chunks, image_data = [], []
+    position = len(PNG_SIGNATURE)
+    while position < len(content):
+        length = int.from_bytes(content[position:position + 4], "big")
+        chunk_type = content[position + 4:position + 8]
+        chunk_data = content[position + 8:position + 8 + length]
+        position += length + 12
+        if chunk_type == b"IDAT":
+            image_data.append(chunk_data)
+            if len(image_data) == 1:
+                chunks.append((chunk_type, None))
+        elif chunk_type in PNG_KEPT_CHUNKS:
+            chunks.append((chunk_type, chunk_data))
+
+    compressed = zlib.compress(zlib.decompress(b"".join(image_data)), 9)
+    optimized = PNG_SIGNATURE + b"".join(
+        create_png_chunk(chunk_type, compressed if chunk_data is None else chunk_data)
+        for chunk_type, chunk_data in chunks)
+    return optimized if len(optimized) < len(content) else content
 
-        log.info("Closing archive. DONE")
-        oxt.close()
 
+def create_png_chunk(chunk_type: bytes, chunk_data: bytes) -> bytes:
+    checksum = zlib.crc32(chunk_type + chunk_data)
+    return len(chunk_data).to_bytes(4, "big") + chunk_type + chunk_data + checksum.to_bytes(4, "big")
 
-def remove_temp_structure(output_directory_path: str = DIRECTORY_TEMP_FILES) -> None:
+
+def generate_entries(icons: Dict[str, bytes] = None, overrides: dict = None) -> Dict[str, bytes]:
     """
-    param output_directory_path:
-    :return:
+    param icons: Prepared icons, read from the assets as they are by default
+    param overrides: Values of core_constants to replace in the installed extension
+    :return: Content of generated archive entries by their names inside the archive
+    """
+    icons = files_content.load_icons() if icons is None else icons
+    # NOTE: Every build ships its version, otherwise the installed extension computes it on office start
+    overrides = {"EXTENSION_VERSION": files_content.EXTENSION_VERSION, **(overrides or {})}
+    entries = {
+        f"src/pythonpath/{VARIANT_MODULE}.py":
+            f"# coding: utf-8\nVARIANT_OVERRIDES = {overrides!r}\n".encode("utf-8"),
+    }
+    for file_name, file_content in files_content.files.items():
+        if file_name == "manifest.xml":
+            file_name = f"{FOLDER_META_INF}/{file_name}"
+        entries[file_name] = file_content.encode("utf-8")
+
+    for icon_name, icon_content in icons.items():
+        entries[f"{FOLDER_ICONS}/{icon_name}"] = icon_content
+    return entries
+
+
+def collect_source_files() -> Dict[str, str]:
+    """
+    :return: Paths of the extension source files by their names inside the archive
     """
-    shutil.rmtree(output_directory_path, ignore_errors=True)
-    log.info("Remove the Temporary directory '%s'", output_directory_path)
+    source_files = {}
+    for root, _, _files in os.walk(DIRECTORY_EXTENSION):
+        if root.endswith("__pycache__"):
+            continue
+        for filename in _files:
+            path = os.path.join(root, filename)
+            source_files[os.path.relpath(path, DIRECTORY_EXTENSION).replace(os.sep, "/")] = path
+    return source_files
+
+
+def write_oxt(entries: Dict[str, bytes], source_files: Dict[str, str], extension_name: str = None) -> str:
+    """
+    param entries: Content of generated archive entries by their names
+    param source_files: Paths of files streamed into the archive by their names
+    param extension_name: File name of the archive, built from the version by default
+    :return: File name of the created archive
+    """
+    os.makedirs(DIRECTORY_PROJECT_BUILDS, exist_ok=True)
+    extension_name = extension_name or \
+        f"{EXTENSION_NAME}_{files_content.EXTENSION_VERSION}.{DEFAULT_OUTPUT_EXTENSION}"
+    output_extension_path = os.path.join(DIRECTORY_PROJECT_BUILDS, extension_name)
+    date_time = max(core_constants.BUILD_TIME.timetuple()[:6], ZIP_EPOCH)
+
+    with ZipFile(output_extension_path, 'w', ZIP_DEFLATED) as oxt:
+        # NOTE: Same names, order, dates and attributes give byte-identical archives
+        for entry_name in sorted(set(entries) | set(source_files)):
+            if entry_name in entries:
+                content = entries[entry_name]
+            else:
+                with open(source_files[entry_name], "rb") as file:
+                    content = file.read()
+            oxt.writestr(create_zip_info(entry_name, date_time), content)
+            log.info("Packing file: %s", entry_name)
+
+    log.info("Closing archive. DONE")
+    return extension_name
+
+
+def create_zip_info(entry_name: str, date_time: tuple) -> ZipInfo:
+    zip_info = ZipInfo(entry_name, date_time)
+    zip_info.compress_type = ZIP_DEFLATED
+    zip_info.create_system = ZIP_SYSTEM_UNIX
+    zip_info.external_attr = ZIP_FILE_ATTRIBUTES
+    return zip_info
 
 
 if __name__ == '__main__':
-    DIRECTORY_PROJECT_SOURCE = str(pathlib.Path(__file__).parent.absolute())
-    DIRECTORY_EXTENSION = os.path.join(DIRECTORY_PROJECT_SOURCE, "extension")
-    DIRECTORY_PROJECT = pathlib.Path(DIRECTORY_PROJECT_SOURCE).parent.absolute()
-    DIRECTORY_PROJECT_BUILDS = os.path.join(DIRECTORY_PROJECT, "builds")
-    generate_extension()
+    parser = argparse.ArgumentParser(description="Build the LibreOffice extension archive")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="skip the build if no input changed since the previous one")
+    parser.add_argument(
+        "--matrix", metavar="PATH",
+        help="build every variant of the JSON build matrix, e.g. source/build_matrix.json")
+    parser.add_argument(
+        "--processes", type=int,
+        help="number of worker processes for the matrix build")
+    parser.add_argument(
+        "--optimize-icons", action="store_true",
+        help="strip ancillary PNG chunks and recompress the icons")
+    parser.add_argument(
+        "--build-time", type=int, metavar="EPOCH",
+        help=f"Unix time of the build for reproducible archives, overrides {BUILD_TIME_VARIABLE}")
+    arguments, _ = parser.parse_known_args()
+
+    if arguments.build_time is not None:
+        set_build_time(arguments.build_time)
+
+    if arguments.matrix:
+        generate_variants(arguments.matrix, arguments.processes, arguments.optimize_icons)
+    elif arguments.incremental:
+        generate_extension_incremental(arguments.optimize_icons)
+    else:
+        generate_extension(arguments.optimize_icons)